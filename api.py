@@ -2,68 +2,165 @@ from __future__ import annotations
 
 import os
 import asyncio
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 from typing import Any, Dict, Optional
 
+import httpx
+from cachetools import TTLCache
 from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 import json
+import orjson
 
-from callpilot.graph import _get_tools_async, build_graph, run_local_proposal, confirm_local_booking
+from callpilot.state import CallState
+from callpilot.graph import (
+    _get_tools_async,
+    build_graph,
+    close_mcp_http_clients,
+    confirm_local_booking,
+    run_local_proposal,
+)
+
+logger = logging.getLogger("callpilot.api")
+
+# Failures from tools, LLM and MCP calls that /chat reports back to the user.
+# Anything else (including cancellation) propagates.
+_HANDLED_ERRORS = (LookupError, ValueError, RuntimeError, OSError, httpx.HTTPError)
+
+_TRUTHY = frozenset({"1", "true", "yes", "y"})
+# Read once at import; MCP mode is fixed for the lifetime of the process
+_USE_MCP_DEFAULT = os.getenv("USE_MCP", "").lower() in _TRUTHY
 
 app = FastAPI(title="CallPilot API", version="0.1.0")
 
+# Constant probe bodies, serialized once at import
+_HEALTH_BYTES = orjson.dumps({"status": "ok"})
+_PING_BYTES = orjson.dumps({"ok": True})
+
+# Pool for blocking graph work, installed as the loop's default executor at
+# startup, so asyncio.to_thread and LangGraph's sync nodes run on it
+_GRAPH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CALLPILOT_SYNC_WORKERS", "16")),
+    thread_name_prefix="callpilot-graph",
+)
+# Concurrent MCP/LLM graph runs allowed (backpressure semaphore built at startup)
+_MAX_CONCURRENT_MCP = int(os.getenv("CALLPILOT_MAX_CONCURRENT_MCP", "8"))
+
+# Short-lived cache of local proposals keyed on request inputs.
+# Only touched from the event loop thread, so no lock is needed.
+_PROPOSAL_CACHE: TTLCache = TTLCache(
+    maxsize=512, ttl=float(os.getenv("CALLPILOT_PROPOSAL_TTL", "60"))
+)
+
 @app.on_event("startup")
 async def startup():
+    asyncio.get_running_loop().set_default_executor(_GRAPH_EXECUTOR)
+    # Created on the serving loop, which the semaphore is bound to
+    app.state.mcp_semaphore = asyncio.Semaphore(_MAX_CONCURRENT_MCP)
     app.state.mcp_tools = await _get_tools_async()
-    
-async def _run_graph_async(payload: Dict[str, Any]) -> Dict[str, Any]:
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_mcp_http_clients()
+    _GRAPH_EXECUTOR.shutdown(wait=False)
+
+
+@lru_cache(maxsize=2)
+def _get_graph(use_mcp: bool):
+    """Return the compiled graph for the given mode, compiling it only once."""
+    return build_graph(use_mcp=use_mcp, mcp_tools=app.state.mcp_tools if use_mcp else None)
+
+
+async def _run_graph_async(req: RunRequest) -> Dict[str, Any]:
     """Run the graph workflow asynchronously (supports both MCP and local modes)."""
-    use_mcp = os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"}
-    app_graph = build_graph(use_mcp=use_mcp, mcp_tools=app.state.mcp_tools if use_mcp else None)
-
-    init_state: Dict[str, Any] = {
-        "specialty": payload.get("specialty", "dentist"),
-        "time_window": payload.get("time_window", "this week afternoons"),
-        "radius_km": float(payload.get("radius_km", 5.0)),
-        "user_location": payload.get("user_location", "Berlin"),
-        "transcript": [],
-        "use_speech": False,
-        "user_text": payload.get("user_text"),
-    }
+    use_mcp = _USE_MCP_DEFAULT
+    app_graph = _get_graph(use_mcp)
+    init_state = req.init_state
 
+    final_state: CallState
     if use_mcp:
         # Use async invocation for MCP mode
-        final_state = await app_graph.ainvoke(init_state)
+        async with app.state.mcp_semaphore:
+            final_state = await app_graph.ainvoke(init_state)
     else:
-        # Use sync invocation for local mode (run in executor to keep API async)
-        loop = asyncio.get_event_loop()
-        final_state = await loop.run_in_executor(None, app_graph.invoke, init_state)
-        if final_state is None:
-            final_state = {}
-            for value in app_graph.stream(init_state, stream_mode="values"):
-                if value is not None:
-                    final_state = value
+        # LangGraph runs the local graph's sync nodes on the default executor
+        final_state = await app_graph.ainvoke(init_state)
+
+    # Local graph always ends with "result"; the MCP graph ends with "result_text"
+    return final_state.get("result") or {
+        "result_text": final_state.get("result_text"),
+        "best_option": final_state.get("best_option"),
+    }
 
-    if isinstance(final_state, dict) and "result" in final_state:
-        return final_state["result"]
-    if isinstance(final_state, dict) and "result_text" in final_state:
-        return {"result_text": final_state["result_text"], "best_option": final_state.get("best_option")}
-    return final_state
 
+# Keys of a proposal state that /confirm and /chat/confirm need to book it
+_STATE_CONFIRM_KEYS = ("provider", "chosen_slot", "specialty", "transcript")
 
-def _run_graph(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Sync wrapper for backward compatibility."""
-    return asyncio.run(_run_graph_async(payload))
+
+def _confirm_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Slice the minimal state needed to confirm a proposal.
+
+    Each response gets a fresh ``booking_id``: retries of that confirmation
+    are idempotent, while two clients served the same cached proposal are
+    still reserved separately.
+    """
+    confirm_state = {k: state.get(k) for k in _STATE_CONFIRM_KEYS}
+    if confirm_state["transcript"] is None:
+        confirm_state["transcript"] = []
+    confirm_state["booking_id"] = uuid.uuid4().hex
+    return confirm_state
+
+
+async def _cached_proposal(req: RunRequest) -> Dict[str, Any]:
+    """Run the local proposal flow, reusing a recent result for identical inputs."""
+    # Frozen requests hash by field values, so the request itself is the key
+    state = _PROPOSAL_CACHE.get(req)
+    if state is None:
+        state = await asyncio.to_thread(run_local_proposal, req.init_state)
+        # Don't pin transient failures (e.g. upstream API errors) in the cache
+        if not state.get("error"):
+            _PROPOSAL_CACHE[req] = state
+    return state
+
+
+def _evict_proposals(provider: Dict[str, Any], slot: Dict[str, Any]) -> None:
+    """Drop cached proposals of a slot that was just booked, so it isn't offered again."""
+    provider_id = provider.get("id")
+    stale = [
+        key for key, state in _PROPOSAL_CACHE.items()
+        if state.get("chosen_slot") == slot and (state.get("provider") or {}).get("id") == provider_id
+    ]
+    for key in stale:
+        _PROPOSAL_CACHE.pop(key, None)
 
 
 class RunRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, populate_by_name=True)
+
     specialty: Optional[str] = Field(default="dentist")
     time_window: Optional[str] = Field(default="this week afternoons")
     radius_km: Optional[float] = Field(default=5.0)
     user_location: Optional[str] = Field(default="Berlin")
     user_text: Optional[str] = Field(default=None)
 
+    @cached_property
+    def init_state(self) -> Dict[str, Any]:
+        """Initial graph state for this request, built once per instance."""
+        return {
+            "specialty": self.specialty,
+            "time_window": self.time_window,
+            "radius_km": float(self.radius_km or 5.0),
+            "user_location": self.user_location,
+            "transcript": [],
+            "use_speech": False,
+            "user_text": self.user_text,
+        }
+
 
 class RunResponse(BaseModel):
     result: Dict[str, Any]
@@ -78,6 +175,7 @@ class ConfirmRequest(BaseModel):
     slot: Dict[str, Any]
     specialty: Optional[str] = Field(default=None)
     transcript: Optional[list[str]] = Field(default_factory=list)
+    booking_id: Optional[str] = Field(default=None, description="Idempotency key from the proposal state")
 
 
 class ConfirmResponse(BaseModel):
@@ -98,39 +196,68 @@ class ChatResponse(BaseModel):
     error: Optional[str] = Field(default=None, description="Error message if any")
 
 
+def _chat_body(
+    message: str,
+    appointment: Optional[Dict[str, Any]] = None,
+    requires_confirmation: bool = False,
+    event_id: Optional[str] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build a ChatResponse-shaped body as a plain dict."""
+    return {
+        "message": message,
+        "appointment": appointment,
+        "requires_confirmation": requires_confirmation,
+        "event_id": event_id,
+        "error": error,
+    }
+
+
+def _sse_event(data: Dict[str, Any]) -> bytes:
+    return b"data: " + orjson.dumps(data, default=str) + b"\n\n"
+
+
 @app.get("/health")
-def health() -> Dict[str, str]:
-    return {"status": "ok"}
+def health() -> Response:
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 @app.post("/run", response_model=RunResponse)
 async def run_callpilot(req: RunRequest) -> RunResponse:
     """Run the full booking workflow and return the final result."""
-    result = await _run_graph_async(req.model_dump())
-    return RunResponse(result=result)
+    result = await _run_graph_async(req)
+    # Result comes straight from our own graph, so skip re-validation
+    return RunResponse.model_construct(result=result)
+
+
+@app.post("/run/stream")
+async def run_callpilot_stream(req: RunRequest) -> StreamingResponse:
+    """Run the workflow and stream each intermediate state as NDJSON."""
+    use_mcp = _USE_MCP_DEFAULT
+    app_graph = _get_graph(use_mcp)
+    init_state = req.init_state
+
+    async def gen():
+        if use_mcp:
+            await app.state.mcp_semaphore.acquire()
+        try:
+            async for value in app_graph.astream(init_state, stream_mode="values"):
+                # LangChain messages aren't JSON-native; fall back to their str form
+                yield orjson.dumps(value, default=str) + b"\n"
+        finally:
+            if use_mcp:
+                app.state.mcp_semaphore.release()
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
 
 
 @app.post("/propose", response_model=ProposeResponse)
-def propose_callpilot(req: RunRequest) -> ProposeResponse:
-    init_state: Dict[str, Any] = {
-        "specialty": req.specialty,
-        "time_window": req.time_window,
-        "radius_km": float(req.radius_km or 5.0),
-        "user_location": req.user_location,
-        "transcript": [],
-        "use_speech": False,
-        "user_text": req.user_text,
-    }
-    state = run_local_proposal(init_state)
+async def propose_callpilot(req: RunRequest) -> ProposeResponse:
+    """Propose an appointment without booking it."""
+    state = await _cached_proposal(req)
     proposal = state.get("proposal", {})
     # Return minimal state needed for confirmation
-    confirm_state = {
-        "provider": state.get("provider"),
-        "chosen_slot": state.get("chosen_slot"),
-        "specialty": state.get("specialty"),
-        "transcript": state.get("transcript", []),
-    }
-    return ProposeResponse(proposal=proposal, state=confirm_state)
+    return ProposeResponse(proposal=proposal, state=_confirm_state(state))
 
 
 @app.post("/confirm", response_model=ConfirmResponse)
@@ -141,163 +268,215 @@ async def confirm_callpilot(req: ConfirmRequest) -> ConfirmResponse:
         "chosen_slot": req.slot,
         "specialty": req.specialty or req.provider.get("specialty"),
         "transcript": req.transcript or [],
+        "booking_id": req.booking_id,
     }
-    loop = asyncio.get_event_loop()
-    final_state = await loop.run_in_executor(None, confirm_local_booking, state)
+    final_state = await confirm_local_booking(state)
+    _evict_proposals(req.provider, req.slot)
     result = final_state.get("result", final_state) if isinstance(final_state, dict) else {"result": final_state}
     return ConfirmResponse(result=result)
 
 
+def _use_mcp(req: ChatRequest) -> bool:
+    return req.use_mcp if req.use_mcp is not None else _USE_MCP_DEFAULT
+
+
+def _mcp_init_state(message: str) -> Dict[str, Any]:
+    return {
+        "transcript": [],
+        "use_speech": False,
+        "user_text": message,
+    }
+
+
+def _mcp_error_body(e: Exception) -> Dict[str, Any]:
+    return _chat_body(
+        message=f"I encountered an error processing your request: {str(e)}",
+        error=str(e),
+        requires_confirmation=False
+    )
+
+
+def _mcp_chat_body(final_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the ChatResponse body from the MCP graph's final state."""
+    result_text = final_state.get("result_text", "I've processed your request.")
+    best_option = final_state.get("best_option", {})
+    event_id = final_state.get("event_id")
+    
+    appointment_data = None
+    if isinstance(best_option, dict) and best_option.get("provider"):
+        appointment_data = best_option
+    
+    return _chat_body(
+        message=result_text,
+        appointment=appointment_data,
+        requires_confirmation=False,  # MCP handles booking automatically
+        event_id=event_id,
+        error=None
+    )
+
+
+async def _chat_reply(req: ChatRequest) -> Dict[str, Any]:
+    """Process a chat message and build the ChatResponse body.
+    
+    Automatically determines whether to use MCP or local workflow.
+    """
+    if _use_mcp(req):
+        # MCP/LLM Agent Mode - full workflow
+        try:
+            async with app.state.mcp_semaphore:
+                final_state = await _get_graph(True).ainvoke(_mcp_init_state(req.message))
+        except _HANDLED_ERRORS as e:
+            logger.exception("chat: MCP workflow failed")
+            return _mcp_error_body(e)
+        return _mcp_chat_body(final_state)
+
+    # Local workflow mode - propose first, then confirm
+    run_req = RunRequest(
+        specialty=None,  # Will be extracted from message
+        time_window=None,
+        user_text=req.message,
+    )
+    
+    # Run proposal
+    try:
+        state = await _cached_proposal(run_req)
+    except _HANDLED_ERRORS as e:
+        logger.exception("chat: local proposal failed")
+        return _chat_body(
+            message=f"I encountered an error: {str(e)}",
+            error=str(e),
+            requires_confirmation=False
+        )
+    proposal = state.get("proposal", {})
+    
+    if proposal.get("error"):
+        return _chat_body(
+            message=f"I couldn't find an appointment: {proposal['error']}",
+            error=proposal['error'],
+            requires_confirmation=False
+        )
+    
+    provider = proposal.get("provider", {})
+    slot = proposal.get("slot", {})
+    
+    appointment_data = {
+        "provider": provider,
+        "slot": slot,
+        "_state": _confirm_state(state),  # Internal state for confirmation
+    }
+    
+    message = f"I found an appointment with {provider.get('name', 'a provider')} at {slot.get('start', 'an available time')}.\n\nWould you like me to book this appointment?"
+    
+    return _chat_body(
+        message=message,
+        appointment=appointment_data,
+        requires_confirmation=True,
+        error=None
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest) -> Dict[str, Any]:
     """Handle chat messages directly from the UI.
     
     This endpoint processes user messages and returns structured responses.
-    It automatically determines whether to use MCP or local workflow.
     """
-    use_mcp_mode = req.use_mcp if req.use_mcp is not None else os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"}
-    
-    if use_mcp_mode:
-        # MCP/LLM Agent Mode - full workflow
-        try:
-            original_use_mcp = os.getenv("USE_MCP")
-            os.environ["USE_MCP"] = "true"
-            
-            app_graph = build_graph(use_mcp=True, mcp_tools=app.state.mcp_tools)
-            
-            init_state: Dict[str, Any] = {
-                "transcript": [],
-                "use_speech": False,
-                "user_text": req.message,
-            }
-            
-            final_state = await app_graph.ainvoke(init_state)
-            
-            # Extract response
-            result_text = final_state.get("result_text", "I've processed your request.")
-            best_option = final_state.get("best_option", {})
-            event_id = final_state.get("event_id")
-            
-            appointment_data = None
-            if isinstance(best_option, dict) and best_option.get("provider"):
-                appointment_data = best_option
-            
-            # Restore original USE_MCP value
-            if original_use_mcp is not None:
-                os.environ["USE_MCP"] = original_use_mcp
-            else:
-                os.environ.pop("USE_MCP", None)
-            
-            return ChatResponse(
-                message=result_text,
-                appointment=appointment_data,
-                requires_confirmation=False,  # MCP handles booking automatically
-                event_id=event_id,
-                error=None
-            )
-            
-        except Exception as e:
-            return ChatResponse(
-                message=f"I encountered an error processing your request: {str(e)}",
-                error=str(e),
-                requires_confirmation=False
-            )
-    else:
-        # Local workflow mode - propose first, then confirm
+    return await _chat_reply(req)
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
+    """Server-sent events variant of /chat.
+
+    Emits a ``status`` event straight away, then ``token`` events, then a
+    ``done`` event carrying the full ChatResponse body. In MCP mode the
+    tokens are the agent model's output as it is generated; the local
+    workflow has no model, so its finished message is sent as one token.
+    """
+    async def gen():
+        yield _sse_event({"status": "processing"})
+        if not _use_mcp(req):
+            body = await _chat_reply(req)
+            yield _sse_event({"token": body["message"]})
+            yield _sse_event({"done": True, **body})
+            return
+
+        final_state: Dict[str, Any] = {}
         try:
-            init_state: Dict[str, Any] = {
-                "specialty": None,  # Will be extracted from message
-                "time_window": None,
-                "radius_km": 5.0,
-                "user_location": "Berlin",
-                "transcript": [],
-                "use_speech": False,
-                "user_text": req.message,
-            }
-            
-            # Run proposal
-            loop = asyncio.get_event_loop()
-            state = await loop.run_in_executor(None, run_local_proposal, init_state)
-            proposal = state.get("proposal", {})
-            
-            if proposal.get("error"):
-                return ChatResponse(
-                    message=f"I couldn't find an appointment: {proposal['error']}",
-                    error=proposal['error'],
-                    requires_confirmation=False
-                )
-            
-            provider = proposal.get("provider", {})
-            slot = proposal.get("slot", {})
-            
-            appointment_data = {
-                "provider": provider,
-                "slot": slot,
-                "_state": {  # Internal state for confirmation
-                    "provider": state.get("provider"),
-                    "chosen_slot": state.get("chosen_slot"),
-                    "specialty": state.get("specialty"),
-                    "transcript": state.get("transcript", []),
-                }
-            }
-            
-            message = f"I found an appointment with {provider.get('name', 'a provider')} at {slot.get('start', 'an available time')}.\n\nWould you like me to book this appointment?"
-            
-            return ChatResponse(
-                message=message,
-                appointment=appointment_data,
-                requires_confirmation=True,
-                error=None
-            )
-            
-        except Exception as e:
-            return ChatResponse(
-                message=f"I encountered an error: {str(e)}",
-                error=str(e),
-                requires_confirmation=False
-            )
+            async with app.state.mcp_semaphore:
+                async for mode, chunk in _get_graph(True).astream(
+                    _mcp_init_state(req.message), stream_mode=["messages", "values"]
+                ):
+                    if mode == "values":
+                        final_state = chunk
+                        continue
+                    message, metadata = chunk
+                    # Only the agent's replies; skip tool output and preference extraction
+                    if metadata.get("langgraph_node") == "agent" and isinstance(message.content, str) and message.content:
+                        yield _sse_event({"token": message.content})
+        except _HANDLED_ERRORS as e:
+            logger.exception("chat_stream: MCP workflow failed")
+            body = _mcp_error_body(e)
+        else:
+            body = _mcp_chat_body(final_state)
+        yield _sse_event({"done": True, **body})
+
+    return StreamingResponse(
+        gen(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
 
 @app.get("/ping")
-def ping():
-    return {"ok": True}
+def ping() -> Response:
+    return Response(content=_PING_BYTES, media_type="application/json")
 
-@app.post("/chat/confirm")
-async def chat_confirm(req: ConfirmRequest) -> ChatResponse:
+@app.post("/chat/confirm", response_model=ChatResponse)
+async def chat_confirm(req: ConfirmRequest) -> Dict[str, Any]:
     """Confirm and book an appointment from chat."""
+    state: Dict[str, Any] = {
+        "provider": req.provider,
+        "chosen_slot": req.slot,
+        "specialty": req.specialty or req.provider.get("specialty"),
+        "transcript": req.transcript or [],
+        "booking_id": req.booking_id,
+    }
+    
     try:
-        state: Dict[str, Any] = {
-            "provider": req.provider,
-            "chosen_slot": req.slot,
-            "specialty": req.specialty or req.provider.get("specialty"),
-            "transcript": req.transcript or [],
-        }
-        
-        loop = asyncio.get_event_loop()
-        final_state = await loop.run_in_executor(None, confirm_local_booking, state)
-        result = final_state.get("result", final_state) if isinstance(final_state, dict) else {"result": final_state}
-        
-        event_id = result.get("event_id") if isinstance(result, dict) else None
-        
-        if event_id:
-            message = f"✅ Appointment booked successfully!\n\nCalendar event ID: {event_id}"
-        else:
-            message = "✅ Appointment booked successfully!"
-        
-        return ChatResponse(
-            message=message,
-            appointment=result,
-            requires_confirmation=False,
-            event_id=event_id,
-            error=None
-        )
-        
-    except Exception as e:
-        return ChatResponse(
+        final_state = await confirm_local_booking(state)
+    except _HANDLED_ERRORS as e:
+        logger.exception("chat_confirm: booking failed")
+        return _chat_body(
             message=f"❌ Booking failed: {str(e)}",
             error=str(e),
             requires_confirmation=False
         )
-        
+    _evict_proposals(req.provider, req.slot)
+    result = final_state.get("result", final_state) if isinstance(final_state, dict) else {"result": final_state}
+    
+    event_id = result.get("event_id") if isinstance(result, dict) else None
+    
+    if event_id:
+        message = f"✅ Appointment booked successfully!\n\nCalendar event ID: {event_id}"
+    else:
+        message = "✅ Appointment booked successfully!"
+    
+    return _chat_body(
+        message=message,
+        appointment=result,
+        requires_confirmation=False,
+        event_id=event_id,
+        error=None
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run(
+        "api:app",
+        host="0.0.0.0",
+        port=8001,
+        # uvicorn picks uvloop/httptools when they are installed
+        loop="auto",
+        http="auto",
+        # Proposal/reservation caches and the MCP semaphore are per process;
+        # more than one worker splits them
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
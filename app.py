@@ -1,11 +1,35 @@
 from __future__ import annotations
 
+import hashlib
+import logging
 import os
-from typing import Any, Dict, Optional, Tuple
-
-import requests
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import httpx
+import orjson
 import streamlit as st
 
+from callpilot.sentences import split_sentences
+
+try:
+    from elevenlabs.client import ElevenLabs
+    ELEVENLABS_AVAILABLE = True
+except ImportError:
+    ElevenLabs = None
+    ELEVENLABS_AVAILABLE = False
+
+try:
+    import numpy as np
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
 try:
     from audio_recorder_streamlit import audio_recorder
     AUDIO_RECORDER_AVAILABLE = True
@@ -22,36 +46,170 @@ st.title("CallPilot")
 st.caption("Agentic appointment booking demo")
 
 from dotenv import load_dotenv
-load_dotenv()
+
+
+@st.cache_resource(show_spinner=False)
+def _load_env() -> bool:
+    """Read .env once per process instead of on every rerun."""
+    return load_dotenv()
+
+
+_load_env()
+
+logger = logging.getLogger("callpilot.app")
+
+_TRUTHY = frozenset({"1", "true", "yes", "y"})
+_DEFAULT_USE_MCP = os.getenv("USE_MCP", "").lower() in _TRUTHY
+_API_URL_DEFAULT = os.getenv("CALLPILOT_API_URL", "http://localhost:8001")
+
+
+def _prewarm(client: ElevenLabs) -> None:
+    """Issue a cheap authenticated GET so the pool holds a warm TLS connection."""
+    try:
+        client.models.list()
+    except Exception:
+        # Only an optimization; the first real call reports auth/network errors
+        logger.debug("ElevenLabs connection pre-warm failed", exc_info=True)
+
+
+@st.cache_resource
+def _eleven_client(api_key: str) -> ElevenLabs:
+    """Return a shared ElevenLabs client, kept across reruns and sessions."""
+    client = ElevenLabs(api_key=api_key)
+    # Pay the TLS handshake in the background, before the first TTS/STT call
+    threading.Thread(target=_prewarm, args=(client,), daemon=True).start()
+    return client
+
+
+if ELEVENLABS_AVAILABLE and os.getenv("ELEVENLABS_API_KEY"):
+    _eleven_client(os.environ["ELEVENLABS_API_KEY"])
+
+
+# Synthesized speech persisted across restarts, keyed by content hash
+_TTS_CACHE_DIR = Path(os.getenv("CALLPILOT_TTS_CACHE_DIR", ".tts_cache"))
+
+# Samples below this absolute amplitude count as silence when trimming recordings
+_SILENCE_THRESHOLD = float(os.getenv("CALLPILOT_SILENCE_THRESHOLD", "0.01"))
+
+# Number of most recent chat messages rendered on each rerun
+_HISTORY_WINDOW = 20
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Backend call timeouts: fail fast on a dead backend, allow long workflow runs
+_HTTP_TIMEOUT = httpx.Timeout(connect=3, read=120, write=10, pool=5)
+
+
+@st.cache_resource
+def _tts_executor() -> ThreadPoolExecutor:
+    """Return the worker pool used to synthesize sentences in parallel."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="callpilot-tts")
+
+
+@st.cache_resource
+def _stt_executor() -> ThreadPoolExecutor:
+    """Return the worker pool used for background transcription."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="callpilot-stt")
+
+
+@st.cache_resource
+def _http_client() -> httpx.Client:
+    """Return a pooled HTTP/2 client for backend calls, kept across reruns."""
+    return httpx.Client(
+        http2=True,
+        timeout=_HTTP_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    )
+
+
+def _synthesize(client: ElevenLabs, text: str, voice_id: str, model_id: str, output_format: str) -> bytes:
+    # Streaming endpoint with a low-latency model: chunks arrive as they are synthesized
+    chunks = client.text_to_speech.stream(
+        voice_id,
+        text=text,
+        model_id=model_id,
+        output_format=output_format,
+        optimize_streaming_latency=int(os.getenv("ELEVENLABS_STREAMING_LATENCY", "3")),
+    )
+    buf = BytesIO()
+    for chunk in chunks:
+        buf.write(chunk)
+    return buf.getvalue()
+
+
+@st.cache_data(ttl=86400, max_entries=512, show_spinner=False)
+def _cached_tts(text: str, voice_id: str, model_id: str, output_format: str) -> bytes:
+    """Synthesize speech, memoized in memory and on disk by content hash.
+
+    Raises on API failure so that failures are never cached.
+    """
+    digest = hashlib.sha256(f"{text}|{voice_id}|{model_id}|{output_format}".encode()).hexdigest()
+    path = _TTS_CACHE_DIR / f"{digest}.mp3"
+    if path.exists():
+        return path.read_bytes()
+
+    client = _eleven_client(os.environ["ELEVENLABS_API_KEY"])
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        audio = _synthesize(client, text, voice_id, model_id, output_format)
+    else:
+        # Synthesize sentences concurrently; MP3 frames concatenate cleanly in order
+        futures = [
+            _tts_executor().submit(_synthesize, client, s, voice_id, model_id, output_format)
+            for s in sentences
+        ]
+        audio = b"".join(f.result() for f in futures)
+
+    _TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(audio)
+    return audio
+
 
 def _elevenlabs_tts(text: str) -> Optional[bytes]:
-    api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
+    if not ELEVENLABS_AVAILABLE or not os.getenv("ELEVENLABS_API_KEY"):
         return None
     try:
-        from elevenlabs.client import ElevenLabs
-        client = ElevenLabs(api_key=api_key)
-        audio = client.text_to_speech.convert(
-            text=text,
-            voice_id=os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb"),
-            model_id=os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2"),
-            output_format=os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128"),
+        return _cached_tts(
+            text,
+            os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb"),
+            os.getenv("ELEVENLABS_MODEL_ID", "eleven_flash_v2_5"),
+            os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_22050_32"),
         )
-        if isinstance(audio, (bytes, bytearray)):
-            return bytes(audio)
-        # Stream/generator fallback
-        return b"".join(audio)
     except Exception:
         return None
 
 
-def _elevenlabs_stt(audio_bytes: bytes, mime_type: str) -> Optional[str]:
-    api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
-        raise ValueError("ELEVENLABS_API_KEY not found in environment")
+def _compress_for_stt(audio_bytes: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """Trim silence from a WAV recording and re-encode it as Ogg/Opus.
+
+    Shrinks the upload by an order of magnitude; returns the input unchanged
+    when soundfile is missing or the encode fails.
+    """
+    if not SOUNDFILE_AVAILABLE or mime_type != "audio/wav":
+        return audio_bytes, mime_type
+    try:
+        data, sample_rate = sf.read(BytesIO(audio_bytes))
+        level = np.abs(data) if data.ndim == 1 else np.abs(data).max(axis=1)
+        voiced = np.flatnonzero(level > _SILENCE_THRESHOLD)
+        if voiced.size:
+            pad = sample_rate // 10
+            data = data[max(voiced[0] - pad, 0):voiced[-1] + pad]
+        buf = BytesIO()
+        sf.write(buf, data, sample_rate, format="OGG", subtype="OPUS")
+        return buf.getvalue(), "audio/ogg"
+    except Exception:
+        return audio_bytes, mime_type
+
+
+def _elevenlabs_stt(audio_bytes: bytes, mime_type: str, client: Optional[ElevenLabs] = None) -> Optional[str]:
+    if client is None:
+        if not ELEVENLABS_AVAILABLE:
+            raise ValueError("elevenlabs package is not installed")
+        api_key = os.getenv("ELEVENLABS_API_KEY")
+        if not api_key:
+            raise ValueError("ELEVENLABS_API_KEY not found in environment")
+        client = _eleven_client(api_key)
     try:
-        from elevenlabs.client import ElevenLabs
-        client = ElevenLabs(api_key=api_key)
         stt = getattr(client, "speech_to_text", None)
         if not stt:
             raise ValueError("speech_to_text module not available in ElevenLabs client")
@@ -61,6 +219,7 @@ def _elevenlabs_stt(audio_bytes: bytes, mime_type: str) -> Optional[str]:
         # Correct API signature: convert(model_id=..., file=...)
         # Available models: 'scribe_v1', 'scribe_v1_experimental', 'scribe_v2'
         model_id = os.getenv("ELEVENLABS_STT_MODEL_ID", "scribe_v2")
+        audio_bytes, mime_type = _compress_for_stt(audio_bytes, mime_type)
         result = stt.convert(model_id=model_id, file=audio_bytes)
         
         if isinstance(result, dict) and "text" in result:
@@ -74,6 +233,74 @@ def _elevenlabs_stt(audio_bytes: bytes, mime_type: str) -> Optional[str]:
         raise Exception(f"STT failed: {str(e)}") from e
 
 
+def _audio_key(audio_bytes: bytes) -> int:
+    """Cheap dedup key for recorder/upload buffers: length plus head and tail.
+
+    Only needs to tell one recording from the next within a session, so
+    hashing the whole (multi-MB) WAV on every rerun is unnecessary.
+    """
+    return hash((len(audio_bytes), audio_bytes[:4096], audio_bytes[-4096:]))
+
+
+def _start_stt(audio_bytes: bytes, mime_type: str, hash_key: str) -> bool:
+    """Submit new audio for transcription on the background pool.
+
+    The pending future is kept in session state and picked up on later reruns,
+    so the script never blocks on the ElevenLabs round-trip. Returns True if
+    this audio was not seen before.
+    """
+    audio_hash = _audio_key(audio_bytes)
+    if audio_hash == st.session_state.get(hash_key) or "stt_future" in st.session_state:
+        return False
+    st.session_state[hash_key] = audio_hash
+    if not ELEVENLABS_AVAILABLE:
+        st.error("❌ Transcription error: elevenlabs package is not installed")
+        return True
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key:
+        st.error("❌ Transcription error: ELEVENLABS_API_KEY not found in environment")
+        return True
+    # Resolve the cached client here; worker threads have no Streamlit script context
+    st.session_state.stt_future = _stt_executor().submit(
+        _elevenlabs_stt, audio_bytes, mime_type, _eleven_client(api_key)
+    )
+    return True
+
+
+def _store_audio(audio: bytes) -> str:
+    """Keep reply audio out of the message list; messages reference it by id."""
+    audio_id = uuid.uuid4().hex
+    st.session_state.audio_store[audio_id] = audio
+    return audio_id
+
+
+def _render_message_extras(audio: Optional[bytes], appointment: Optional[Dict[str, Any]]) -> None:
+    """Render a chat message's reply audio and appointment details."""
+    # Streamlit serves audio bytes from its /media endpoint under a
+    # content-hash URL, so the browser fetches each clip once and reuses it
+    # across reruns.
+    if audio:
+        st.audio(audio, format="audio/mpeg")
+    if appointment:
+        with st.expander("📋 Appointment Details"):
+            st.json(appointment, expanded=False)
+
+
+@st.fragment
+def _render_chat_history() -> None:
+    """Render the most recent chat messages and drop audio that scrolled out."""
+    visible = st.session_state.chat_messages[-_HISTORY_WINDOW:]
+    audio_store = st.session_state.audio_store
+    live_ids = {msg["audio_id"] for msg in visible if msg.get("audio_id")}
+    for audio_id in audio_store.keys() - live_ids:
+        del audio_store[audio_id]
+
+    for msg in visible:
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
+            _render_message_extras(audio_store.get(msg.get("audio_id")), msg.get("appointment"))
+
+
 def _render_proposal(proposal: Dict[str, Any]) -> None:
     if proposal.get("error"):
         st.error(proposal["error"])
@@ -96,8 +323,8 @@ def _render_proposal(proposal: Dict[str, Any]) -> None:
 
 with st.sidebar:
     st.header("Run Mode")
-    use_mcp = st.checkbox("Use MCP/LLM Agent Mode", value=os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"})
-    api_url = st.text_input("Backend API URL", value=os.getenv("CALLPILOT_API_URL"))
+    use_mcp = st.checkbox("Use MCP/LLM Agent Mode", value=_DEFAULT_USE_MCP)
+    api_url = st.text_input("Backend API URL", value=_API_URL_DEFAULT)
     st.info("💡 All queries are processed through the backend API")
     st.divider()
     st.header("Inputs")
@@ -121,44 +348,31 @@ with st.sidebar:
         user_location = st.text_input("Location", value="Berlin")
         user_text = st.text_area("Natural language request (optional)", value="")
 
+# Backend endpoints, normalized once per script pass
+api_url = (api_url or "").rstrip("/")
+chat_stream_url = f"{api_url}/chat/stream"
+confirm_url = f"{api_url}/chat/confirm"
+
 
 audio_blob: Optional[Tuple[bytes, str]] = None
 if input_mode == "Speech":
     st.subheader("🎤 Speech Input")
     
-    # Real-time microphone recording
+    # Live recording uses the single recorder in the Voice Input section below
     if AUDIO_RECORDER_AVAILABLE:
-        st.info("Click the microphone to start recording, click again to stop")
-        audio_bytes = audio_recorder(
-            pause_threshold=2.0,
-            sample_rate=16000,
-            text="",
-            recording_color="#e74c3c",
-            neutral_color="#6c757d",
-            icon_size="2x"
-        )
-        if audio_bytes:
-            audio_blob = (audio_bytes, "audio/wav")
-            st.audio(audio_bytes, format="audio/wav")
+        st.info("Use the microphone in the Voice Input section below to record")
     else:
         st.warning("⚠️ Real-time recording not available. Install: `pip install audio-recorder-streamlit`")
     
-    # Fallback: file upload option
+    # File upload option
     with st.expander("📁 Or upload an audio file"):
         audio_file = st.file_uploader("Upload audio (wav/mp3/m4a)", type=["wav", "mp3", "m4a"])
         if audio_file is not None:
-            audio_blob = (audio_file.read(), audio_file.type or "audio/wav")
+            # getvalue() returns the buffer Streamlit already holds; read() copies it
+            audio_blob = (audio_file.getvalue(), audio_file.type or "audio/wav")
             st.audio(audio_blob[0], format=audio_blob[1])
 
 
-payload: Dict[str, Any] = {
-    "specialty": specialty,
-    "time_window": time_window,
-    "radius_km": float(radius_km) if radius_km else 5.0,
-    "user_location": user_location,
-    "user_text": user_text.strip() or None,
-}
-
 # Initialize session state
 if "mcp_result" not in st.session_state:
     st.session_state.mcp_result = None
@@ -174,6 +388,8 @@ if "processing" not in st.session_state:
     st.session_state.processing = False
 if "audio_response" not in st.session_state:
     st.session_state.audio_response = None
+if "audio_store" not in st.session_state:
+    st.session_state.audio_store = {}
 
 # Chat interface
 st.subheader("💬 Chat Interface")
@@ -183,6 +399,7 @@ col1, col2 = st.columns([4, 1])
 with col2:
     if st.button("🗑️ Clear Chat"):
         st.session_state.chat_messages = []
+        st.session_state.audio_store = {}
         st.session_state.proposal = None
         st.session_state.proposal_state = None
         st.session_state.mcp_result = None
@@ -190,44 +407,63 @@ with col2:
         st.rerun()
 
 # Display chat history
-for msg in st.session_state.chat_messages:
-    with st.chat_message(msg["role"]):
-        st.write(msg["content"])
-        # Show audio if available
-        if msg.get("audio"):
-            st.audio(msg["audio"], format="audio/mpeg")
-        # Show appointment details if available
-        if msg.get("appointment"):
-            appt = msg["appointment"]
-            with st.expander("📋 Appointment Details"):
-                st.json(appt)
+_render_chat_history()
+
+
+def _chat_stream(chat_payload: Dict[str, Any], final: Dict[str, Any]) -> Iterator[str]:
+    """Yield reply tokens from the backend's SSE chat stream.
+
+    The closing ``done`` event, carrying the full ChatResponse body, is
+    copied into ``final``.
+    """
+    with _http_client().stream(
+        "POST",
+        chat_stream_url,
+        content=orjson.dumps(chat_payload),
+        headers={**_JSON_HEADERS, "Accept": "text/event-stream"},
+    ) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = orjson.loads(line[6:])
+            token = event.get("token")
+            if token:
+                yield token
+            elif event.get("done"):
+                final.update(event)
 
 
 def process_user_message(user_message: str):
-    """Process user message via backend API and get agent/workflow response."""
+    """Process user message via backend API and get agent/workflow response.
+
+    Renders the new turn in place, below the history, so no rerun is needed.
+    """
     # Add user message to chat
     st.session_state.chat_messages.append({"role": "user", "content": user_message})
+    with st.chat_message("user"):
+        st.write(user_message)
     
     assistant_response = None
     appointment_data = None
     audio_data = None
     requires_confirmation = False
     
-    with st.spinner("🤖 Processing your request..."):
+    assistant_box = st.chat_message("assistant")
+    with assistant_box, st.spinner("🤖 Processing your request..."):
         try:
-            # Send message to backend /chat endpoint
+            # Stream the reply from the backend /chat endpoint as it arrives
             chat_payload = {
                 "message": user_message,
                 "use_mcp": use_mcp,
                 "conversation_history": []  # Could track full history if needed
             }
             
-            resp = requests.post(f"{api_url.rstrip('/')}/chat", json=chat_payload, timeout=120)
-            resp.raise_for_status()
-            result = resp.json()
+            result: Dict[str, Any] = {}
+            streamed = st.write_stream(_chat_stream(chat_payload, result))
             
             # Extract response
-            assistant_response = result.get("message", "I've processed your request.")
+            assistant_response = result.get("message") or streamed or "I've processed your request."
             appointment_data = result.get("appointment")
             requires_confirmation = result.get("requires_confirmation", False)
             error = result.get("error")
@@ -248,103 +484,180 @@ def process_user_message(user_message: str):
                 st.session_state.proposal = None
                 st.session_state.proposal_state = None
                 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             assistant_response = f"❌ Backend connection error: {str(e)}\n\nPlease ensure the backend API is running on {api_url}"
+            st.write(assistant_response)
         except Exception as e:
             assistant_response = f"❌ Error: {str(e)}"
+            st.write(assistant_response)
 
     # Generate speech if enabled
     if enable_speech and assistant_response:
         audio_data = _elevenlabs_tts(assistant_response)
+    with assistant_box:
+        _render_message_extras(audio_data, appointment_data)
     
     # Add assistant response to chat
     msg_data = {"role": "assistant", "content": assistant_response}
     if appointment_data:
         msg_data["appointment"] = appointment_data
     if audio_data:
-        msg_data["audio"] = audio_data
+        msg_data["audio_id"] = _store_audio(audio_data)
     
     st.session_state.chat_messages.append(msg_data)
     return True
 
 
-# Handle audio input for speech mode
-if input_mode == "Speech" and audio_blob:
-    # Track processed audio to avoid re-processing on rerun
-    if "last_audio_hash" not in st.session_state:
-        st.session_state.last_audio_hash = None
-    
-    current_audio_hash = hash(audio_blob[0])
-    
-    if current_audio_hash != st.session_state.last_audio_hash:
-        with st.spinner("🎤 Transcribing audio..."):
+def _confirm_proposal() -> None:
+    """Book the pending proposal via the backend and render the reply in place."""
+    with st.chat_message("assistant"):
+        with st.spinner("Booking appointment..."):
             try:
-                transcript = _elevenlabs_stt(audio_blob[0], audio_blob[1])
-                if transcript:
-                    st.session_state.last_audio_hash = current_audio_hash
-                    st.success(f"📝 Transcribed: \"{transcript}\"")
-                    # Process the transcribed message through the same flow as text
-                    process_user_message(transcript)
-                    st.rerun()
-                else:
-                    st.error("❌ Transcription returned empty result")
+                # Send confirmation to backend
+                confirm_payload = {
+                    "provider": st.session_state.proposal_state.get("provider"),
+                    "slot": st.session_state.proposal_state.get("chosen_slot"),
+                    "specialty": st.session_state.proposal_state.get("specialty"),
+                    "transcript": st.session_state.proposal_state.get("transcript", []),
+                    "booking_id": st.session_state.proposal_state.get("booking_id"),
+                }
+                resp = _http_client().post(
+                    confirm_url,
+                    content=orjson.dumps(confirm_payload),
+                    headers=_JSON_HEADERS,
+                )
+                resp.raise_for_status()
+                result = orjson.loads(resp.content)
             except Exception as e:
-                st.error(f"❌ Transcription error: {str(e)}")
+                error_msg = f"❌ Booking failed: {str(e)}"
+                st.session_state.chat_messages.append({"role": "assistant", "content": error_msg})
+                st.write(error_msg)
+                return
+
+        # Extract response
+        success_msg = result.get("message", "✅ Appointment booked successfully!")
+        appointment_result = result.get("appointment")
+        st.write(success_msg)
+
+        # Add success message to chat
+        msg_data = {"role": "assistant", "content": success_msg}
+        if appointment_result:
+            msg_data["appointment"] = appointment_result
+
+        audio = _elevenlabs_tts(success_msg) if enable_speech else None
+        if audio:
+            msg_data["audio_id"] = _store_audio(audio)
+        _render_message_extras(audio, appointment_result)
+
+        st.session_state.chat_messages.append(msg_data)
+        st.session_state.proposal = None
+        st.session_state.proposal_state = None
 
-# Voice input section - always visible
-st.markdown("---")
-st.markdown("### 🎤 Voice Input")
-st.caption(f"Debug: AUDIO_RECORDER_AVAILABLE = {AUDIO_RECORDER_AVAILABLE}")
-if AUDIO_RECORDER_AVAILABLE:
-    st.caption("Click the microphone to record, click again to stop")
-    recorded_audio = audio_recorder(
-        pause_threshold=2.0,
-        sample_rate=16000,
-        text="Click to record",
-        recording_color="#e74c3c",
-        neutral_color="#3498db",
-        icon_size="3x"
-    )
-    
-    # Handle recorded audio
-    if recorded_audio:
-        if "last_recorded_hash" not in st.session_state:
-            st.session_state.last_recorded_hash = None
-        
-        current_hash = hash(recorded_audio)
-        if current_hash != st.session_state.last_recorded_hash:
-            st.session_state.last_recorded_hash = current_hash
+
+def _submit_chat() -> None:
+    st.session_state.pending_msg = st.session_state.chat_in
+
+
+def _request_confirm() -> None:
+    st.session_state.confirm_requested = True
+
+
+# Work queued by widget callbacks (or a finished transcript) renders right
+# below the history in this same script pass
+pending_msg = st.session_state.pop("pending_msg", None)
+if pending_msg:
+    process_user_message(pending_msg)
+if st.session_state.pop("confirm_requested", False) and st.session_state.proposal_state:
+    _confirm_proposal()
+
+
+# Transcribe uploaded audio in speech mode
+if input_mode == "Speech" and audio_blob:
+    # Track processed audio to avoid re-processing on rerun
+    _start_stt(audio_blob[0], audio_blob[1], "last_audio_hash")
+
+
+# How often a pending transcription is checked for completion, in seconds
+_STT_POLL_INTERVAL = 0.5
+
+
+@st.fragment(run_every=_STT_POLL_INTERVAL)
+def _stt_poller() -> None:
+    """Check the background transcription on a timer until it finishes.
+
+    Streamlit reruns this fragment on its own schedule, so no script thread
+    sleeps while waiting. Once the future is done its outcome is handed to a
+    full-app rerun, which stops rendering (and so scheduling) this fragment.
+    """
+    stt_future = st.session_state.get("stt_future")
+    if stt_future is None:
+        return
+    if not stt_future.done():
+        st.info("🎤 Transcribing your speech...")
+        return
+    del st.session_state.stt_future
+    try:
+        transcript = stt_future.result()
+    except Exception as e:
+        st.session_state.stt_error = str(e)
+    else:
+        if transcript:
+            # Hand off to the full-app pass, which renders it below the history
+            st.session_state.pending_msg = transcript
+        else:
+            # Empty message: finished, but nothing was transcribed
+            st.session_state.stt_error = ""
+    st.rerun()
+
+
+@st.fragment
+def _voice_section() -> None:
+    """Voice recorder and transcription status.
+
+    Recorder interactions rerun only this fragment; the full app reruns once
+    a transcript has been added to the chat.
+    """
+    st.markdown("---")
+    st.markdown("### 🎤 Voice Input")
+    if AUDIO_RECORDER_AVAILABLE:
+        st.caption("Click the microphone to record, click again to stop")
+        recorded_audio = audio_recorder(
+            pause_threshold=2.0,
+            sample_rate=16000,
+            text="Click to record",
+            recording_color="#e74c3c",
+            neutral_color="#3498db",
+            icon_size="3x"
+        )
+
+        # Handle recorded audio
+        if recorded_audio and _start_stt(recorded_audio, "audio/wav", "last_recorded_hash"):
             st.audio(recorded_audio, format="audio/wav")
-            with st.spinner("🎤 Transcribing your speech..."):
-                try:
-                    transcript = _elevenlabs_stt(recorded_audio, "audio/wav")
-                    if transcript:
-                        st.success(f"📝 You said: \"{transcript}\"")
-                        process_user_message(transcript)
-                        st.rerun()
-                    else:
-                        st.error("❌ Transcription returned empty result")
-                except Exception as e:
-                    st.error(f"❌ Transcription error: {str(e)}")
-                    with st.expander("🔍 Debug info"):
-                        st.code(f"API Key present: {bool(os.getenv('ELEVENLABS_API_KEY'))}")
-                        st.code(f"Audio size: {len(recorded_audio)} bytes")
-                        st.code(f"Error: {e}")
-else:
-    import sys
-    st.warning("⚠️ Voice recording not available.")
-    st.code(f"Python: {sys.executable}")
-    st.info("Try: Restart Streamlit or check terminal for import errors")
+    else:
+        import sys
+        st.warning("⚠️ Voice recording not available.")
+        st.code(f"Python: {sys.executable}")
+        st.info("Try: Restart Streamlit or check terminal for import errors")
+
+    # Report the last finished transcription, or watch the pending one
+    stt_error = st.session_state.pop("stt_error", None)
+    if stt_error:
+        st.error(f"❌ Transcription error: {stt_error}")
+        with st.expander("🔍 Debug info"):
+            st.code(f"API Key present: {bool(os.getenv('ELEVENLABS_API_KEY'))}")
+            st.code(f"Error: {stt_error}")
+    elif stt_error is not None:
+        st.error("❌ Transcription returned empty result")
+    if "stt_future" in st.session_state:
+        _stt_poller()
+
+
+# Voice input section - always visible
+_voice_section()
 
 st.markdown("---")
 st.markdown("### ⌨️ Text Input")
-text_prompt = st.chat_input("Type your request here...")
-
-# Process new message if provided
-if text_prompt:
-    success = process_user_message(text_prompt)
-    if success:
-        st.rerun()
+st.chat_input("Type your request here...", key="chat_in", on_submit=_submit_chat)
 
 # Confirmation button for local workflow proposals
 if st.session_state.proposal and not use_mcp:
@@ -354,43 +667,6 @@ if st.session_state.proposal and not use_mcp:
         with col1:
             st.info("💡 Waiting for your confirmation to book this appointment")
         with col2:
-            if st.button("✅ Confirm & Book", type="primary", use_container_width=True):
-                with st.spinner("Booking appointment..."):
-                    try:
-                        # Send confirmation to backend
-                        confirm_payload = {
-                            "provider": st.session_state.proposal_state.get("provider"),
-                            "slot": st.session_state.proposal_state.get("chosen_slot"),
-                            "specialty": st.session_state.proposal_state.get("specialty"),
-                            "transcript": st.session_state.proposal_state.get("transcript", []),
-                        }
-                        resp = requests.post(f"{api_url.rstrip('/')}/chat/confirm", json=confirm_payload, timeout=120)
-                        resp.raise_for_status()
-                        result = resp.json()
-                        
-                        # Extract response
-                        success_msg = result.get("message", "✅ Appointment booked successfully!")
-                        appointment_result = result.get("appointment")
-                        
-                        # Add success message to chat
-                        msg_data = {"role": "assistant", "content": success_msg}
-                        if appointment_result:
-                            msg_data["appointment"] = appointment_result
-                        
-                        if enable_speech:
-                            audio = _elevenlabs_tts(success_msg)
-                            if audio:
-                                msg_data["audio"] = audio
-                        
-                        st.session_state.chat_messages.append(msg_data)
-                        st.session_state.proposal = None
-                        st.session_state.proposal_state = None
-                        st.rerun()
-                        
-                    except Exception as e:
-                        error_msg = f"❌ Booking failed: {str(e)}"
-                        st.session_state.chat_messages.append({"role": "assistant", "content": error_msg})
-                        st.rerun()
-
+            st.button("✅ Confirm & Book", type="primary", use_container_width=True, on_click=_request_confirm)
 
 st.divider()
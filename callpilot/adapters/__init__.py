@@ -2,6 +2,18 @@
 Adapters package for CallPilot
 """
 
-from .receptionist_sim import simulate_receptionist_call, reserve_slot
+from .receptionist_sim import (
+    CallResult,
+    invalidate_reservation,
+    reserve_slot,
+    simulate_receptionist_call,
+    simulate_receptionist_calls,
+)
 
-__all__ = ["simulate_receptionist_call", "reserve_slot"]
+__all__ = [
+    "CallResult",
+    "simulate_receptionist_call",
+    "simulate_receptionist_calls",
+    "reserve_slot",
+    "invalidate_reservation",
+]
@@ -6,66 +6,243 @@ Conversational AI making actual phone calls.
 """
 
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import sys
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
-def simulate_receptionist_call(provider: Dict[str, Any], constraint: str) -> Dict[str, Any]:
+from cachetools import TTLCache
+
+# Slots offered per call (MVP: the first openings on the provider's list)
+_MAX_SLOTS = 3
+
+# Fixed transcript lines, shared across calls
+_RECEP_GREETING = "[RECEP] Hello, how can I help?"
+_RECEP_NO_AVAIL = "[RECEP] Sorry, no availability."
+_AGENT_CONFIRM = "[AGENT] Great, let me confirm one moment."
+# Templates for the per-call lines
+_CALL_LINE = "[CALL] Calling {}..."
+_AGENT_LINE = "[AGENT] I'd like to book an appointment. Constraint: {}"
+_RECEP_SLOTS = "[RECEP] We can do: {}"
+_RECEP_OTHER_SLOTS = "[RECEP] Nothing at that time of day, but we can do: {}"
+
+
+# Time-of-day words in a constraint -> [start, end) hour range ("HH" strings
+# compare correctly against the hour of an ISO "YYYY-MM-DDTHH:MM:SS" start)
+_DAYPART_HOURS = {
+    "morning": ("00", "12"),
+    "afternoon": ("12", "17"),
+    "evening": ("17", "24"),
+}
+
+SlotFilter = Callable[[Mapping[str, str]], bool]
+
+
+@lru_cache(maxsize=2048)
+def _normalize_constraint(constraint: str) -> str:
+    """Canonical form of a scheduling constraint: lowercase, single spaces."""
+    return " ".join(constraint.strip().lower().split())
+
+
+@lru_cache(maxsize=2048)
+def _parse_constraint(normalized: str) -> Optional[SlotFilter]:
+    """Slot predicate for a normalized constraint; None if it doesn't restrict the time of day."""
+    ranges = [hours for word, hours in _DAYPART_HOURS.items() if word in normalized]
+    if not ranges:
+        return None
+
+    def slot_filter(opening: Mapping[str, str]) -> bool:
+        hour = opening["start"][11:13]
+        return any(lo <= hour < hi for lo, hi in ranges)
+
+    return slot_filter
+
+
+def _constraint_filter(constraint: str) -> Optional[SlotFilter]:
+    """Return the slot predicate for a constraint, parsing each shape only once."""
+    return _parse_constraint(_normalize_constraint(constraint))
+
+
+@dataclass(frozen=True, slots=True)
+class CallResult:
+    """Outcome of a (simulated) receptionist call.
+    
+    Results are immutable and may be shared between callers (memoized
+    transcripts, the shared empty result); the slot dicts must be treated
+    as read-only too.
+    
+    Attributes:
+        ok: Whether the provider offered any slots
+        slots: Offered time slots (up to 3)
+        transcript: Conversation lines for logging
+    """
+    ok: bool
+    slots: Tuple[Dict[str, str], ...]
+    transcript: Tuple[str, ...]
+
+    def _asdict(self) -> Dict[str, Any]:
+        """Plain-dict form for JSON serialization boundaries."""
+        return {"ok": self.ok, "slots": list(self.slots), "transcript": list(self.transcript)}
+
+
+# Shared result for providers without openings; CallResult is immutable
+_EMPTY_RESULT = CallResult(ok=False, slots=(), transcript=(_RECEP_NO_AVAIL,))
+_EMPTY_RESULT_BARE = CallResult(ok=False, slots=(), transcript=())
+
+
+@lru_cache(maxsize=1024)
+def _call_lines(
+    provider_name: str, slot_starts: Tuple[str, ...], matched: bool = True
+) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Transcript lines before and after the agent's request; memoized since calls repeat.
+    
+    The constraint is deliberately not part of the key: it is echoed verbatim
+    per call, so differently-spelled constraints still share cache entries.
+    ``matched`` is False when the offered slots are outside the requested
+    time of day, which the receptionist then says.
+    """
+    head = (_CALL_LINE.format(provider_name), _RECEP_GREETING)
+    offer = _RECEP_SLOTS if matched else _RECEP_OTHER_SLOTS
+    tail = (offer.format(", ".join(slot_starts)), _AGENT_CONFIRM)
+    return head, tail
+
+
+def _build_transcript(
+    provider_name: str, constraint: str, slot_starts: Tuple[str, ...], matched: bool = True
+) -> Tuple[str, ...]:
+    """Build the transcript of a call that found slots."""
+    head, tail = _call_lines(provider_name, slot_starts, matched)
+    return (*head, _AGENT_LINE.format(constraint), *tail)
+
+
+def simulate_receptionist_call(
+    provider: Dict[str, Any],
+    constraint: str,
+    *,
+    with_transcript: bool = True,
+) -> CallResult:
     """Simulate a phone call with a provider's receptionist.
     
     Creates a fake conversation transcript and returns available appointment
-    slots from the provider's opening list. This is an MVP stub that will
-    be replaced with real ElevenLabs voice agent integration.
+    slots from the provider's opening list, preferring openings in the
+    time of day the constraint asks for (morning/afternoon/evening), if any.
+    When none fall in that time of day, the first openings are offered
+    instead and the transcript says so. This is an MVP stub that will be
+    replaced with real ElevenLabs voice agent integration.
     
     Args:
         provider: Provider dictionary containing:
                  - name: Provider/practice name
-                 - openings: List of available time slots
+                 - openings: Available time slots (list or any iterable)
         constraint: User's scheduling constraint (e.g., "this week afternoons")
+        with_transcript: Build the conversation transcript. Pass False when
+                        only ok/slots are needed to skip all string work.
     
     Returns:
-        Dictionary with:
+        CallResult with:
         - ok: Boolean indicating if call was successful
-        - slots: List of available time slots (up to 3)
-        - transcript: List of conversation lines for logging
+        - slots: Tuple of available time slots (up to 3)
+        - transcript: Tuple of conversation lines for logging
     
     Example:
         >>> provider = {"name": "Mitte Dental", "openings": [...]}
         >>> result = simulate_receptionist_call(provider, "this week")
-        >>> print(result['ok'])
+        >>> print(result.ok)
         True
-        >>> print(len(result['slots']))
+        >>> print(len(result.slots))
         3
     
     Note:
         Production implementation will use ElevenLabs WebSocket API
         to conduct actual voice conversations with provider offices.
     """
-    openings: List[Dict[str, str]] = provider.get("openings", [])
+    name, openings = provider["name"], provider.get("openings") or ()
+    slot_filter = _constraint_filter(constraint)
+    matched = True
+    if slot_filter is None:
+        # Return top 3 slots; islice never reads past the third
+        slots = tuple(islice(openings, _MAX_SLOTS))
+    else:
+        if not isinstance(openings, (list, tuple)):
+            openings = tuple(openings)
+        slots = tuple(islice(filter(slot_filter, openings), _MAX_SLOTS))
+        if not slots:
+            # Nothing at the requested time of day: offer what there is
+            matched = False
+            slots = tuple(openings[:_MAX_SLOTS])
+    # Check if provider has any availability before building anything
+    if not slots:
+        return _EMPTY_RESULT if with_transcript else _EMPTY_RESULT_BARE
+    if not with_transcript:
+        return CallResult(ok=True, slots=slots, transcript=())
     
-    # Build simulated conversation transcript
-    transcript = [
-        f"[CALL] Calling {provider['name']}...",
-        "[RECEP] Hello, how can I help?",
-        f"[AGENT] I'd like to book an appointment. Constraint: {constraint}",
-    ]
+    # List comprehension: tuple() over a generator takes the slow, unsized path
+    transcript = _build_transcript(name, constraint, tuple([s["start"] for s in slots]), matched)
+    return CallResult(ok=True, slots=slots, transcript=transcript)
+
+def simulate_receptionist_calls(
+    providers: List[Dict[str, Any]],
+    constraint: str,
+    *,
+    with_transcript: bool = True,
+) -> List[CallResult]:
+    """Simulate calls to several providers for the same constraint.
     
-    # Check if provider has any availability
-    if not openings:
-        transcript.append("[RECEP] Sorry, no availability.")
-        return {"ok": False, "slots": [], "transcript": transcript}
+    Batch counterpart of simulate_receptionist_call, mirroring the shape of
+    ElevenLabs batch calling so callers can migrate before the real adapter
+    lands (which can then place the calls concurrently).
     
-    # Return top 3 available slots (MVP: just take first 3 from list)
-    slots = openings[:3]
-    transcript.append(f"[RECEP] We can do: {', '.join(s['start'] for s in slots)}")
-    transcript.append("[AGENT] Great, let me confirm one moment.")
+    Args:
+        providers: Provider dictionaries, as for simulate_receptionist_call
+        constraint: User's scheduling constraint shared by all calls
+        with_transcript: Passed through to simulate_receptionist_call
     
-    return {"ok": True, "slots": slots, "transcript": transcript}
+    Returns:
+        One CallResult per provider, in input order.
+    """
+    call = simulate_receptionist_call
+    constraint = sys.intern(constraint)
+    # Providers without openings all get the shared result, without a call
+    empty = _EMPTY_RESULT if with_transcript else _EMPTY_RESULT_BARE
+    return [
+        call(p, constraint, with_transcript=with_transcript)
+        if p.get("openings")
+        else empty
+        for p in providers
+    ]
+
 
-def reserve_slot(provider: Dict[str, Any], slot: Dict[str, str]) -> bool:
+# Recent successful reservations: booking idempotency key -> (provider name,
+# slot start). Only retries of the same booking are short-circuited.
+_RESERVATIONS: TTLCache = TTLCache(maxsize=4096, ttl=300)
+_RESERVATIONS_LOCK = threading.Lock()
+
+
+def _reserve_impl(provider_name: str, start: str) -> bool:
+    # TODO: Replace with actual provider API/phone call integration
+    return True
+
+
+def reserve_slot(
+    provider: Mapping[str, Any],
+    slot: Mapping[str, str],
+    booking_id: Optional[str] = None,
+) -> bool:
     """Reserve a time slot with the provider.
     
+    With a ``booking_id``, a successful reservation is remembered for 5
+    minutes, so a retry of that same booking (same id, provider and slot)
+    is idempotent and doesn't repeat the call. Any other confirmation,
+    including one for the same slot under a different id, always calls
+    the provider. Failures are not cached.
+    
     Args:
-        provider: Provider dictionary
-        slot: Time slot to reserve
+        provider: Provider mapping (only read)
+        slot: Time slot to reserve (only read)
+        booking_id: Caller's idempotency key for this booking, e.g. issued
+                    with the proposal being confirmed
     
     Returns:
         True if reservation successful, False otherwise.
@@ -74,5 +251,21 @@ def reserve_slot(provider: Dict[str, Any], slot: Dict[str, str]) -> bool:
         MVP always returns True. Production version would make an actual
         API call or phone call to confirm the reservation.
     """
-    # TODO: Replace with actual provider API/phone call integration
-    return True
+    target = (provider["name"], slot["start"])
+    if booking_id is not None:
+        with _RESERVATIONS_LOCK:
+            if _RESERVATIONS.get(booking_id) == target:
+                return True
+    ok = _reserve_impl(*target)
+    if ok and booking_id is not None:
+        with _RESERVATIONS_LOCK:
+            _RESERVATIONS[booking_id] = target
+    return ok
+
+
+def invalidate_reservation(booking_id: Optional[str]) -> None:
+    """Forget a booking's cached reservation, e.g. after it was canceled or failed."""
+    if booking_id is None:
+        return
+    with _RESERVATIONS_LOCK:
+        _RESERVATIONS.pop(booking_id, None)
@@ -6,18 +6,27 @@ and environment variables. Settings are loaded from .env file if present.
 
 from __future__ import annotations
 import os
-from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
 
-@dataclass(frozen=True)
-class Settings:
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """Load environment variables from .env, at most once per process.
+    
+    Set CALLPILOT_SKIP_DOTENV=1 to skip the .env lookup, e.g. in workers
+    whose environment is already fully configured.
+    """
+    if os.getenv("CALLPILOT_SKIP_DOTENV") != "1":
+        load_dotenv()
+
+class Settings(NamedTuple):
     """Application settings and configuration.
     
-    All settings are immutable (frozen=True) to prevent accidental modification.
-    Values can be overridden via environment variables.
+    A NamedTuple: immutable, with plain tuple-index attribute access.
+    Values can be overridden via environment variables, which are read
+    by from_env() when the process-wide instance is built.
     
     Attributes:
         providers_path: Path to the JSON file containing provider data.
@@ -25,8 +34,22 @@ class Settings:
         use_google_apis: Whether to use real Google APIs (Calendar, Places, Maps).
                         Set to False to use MVP stubs. Default: True if API keys present.
     """
-    providers_path: str = os.getenv("PROVIDERS_PATH", "callpilot/data/providers.json")
-    use_google_apis: bool = os.getenv("USE_GOOGLE_APIS", "true").lower() in {"true", "1", "yes"}
+    providers_path: str = "callpilot/data/providers.json"
+    use_google_apis: bool = True
+
+    @classmethod
+    def from_env(cls) -> Settings:
+        """Build settings from the current environment, falling back to the defaults."""
+        return cls(
+            providers_path=os.getenv("PROVIDERS_PATH", cls._field_defaults["providers_path"]),
+            use_google_apis=os.getenv("USE_GOOGLE_APIS", "true").lower() in {"true", "1", "yes"},
+        )
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, built once."""
+    load_env()
+    return Settings.from_env()
 
 # Global settings instance - import this in other modules
-settings = Settings()
+settings = get_settings()
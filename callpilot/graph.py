@@ -1,34 +1,184 @@
 from __future__ import annotations
 import asyncio
+from bisect import bisect_left
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from functools import lru_cache
+import heapq
 from io import BytesIO
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
-from dotenv import load_dotenv
 from elevenlabs import ElevenLabs
 from langgraph.graph import StateGraph, END
 import json
+import logging
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from .config import load_env
+from .sentences import split_sentences
 from .state import CallState
 from .tools.providers import search_providers
-from .adapters.receptionist_sim import simulate_receptionist_call, reserve_slot
-from .tools.calendar import check_calendar_free, create_calendar_event
+from .adapters.receptionist_sim import invalidate_reservation, simulate_receptionist_calls, reserve_slot
+from .tools.calendar import (
+    cancel_calendar_event,
+    check_calendar_busy_ranges,
+    check_calendar_free,
+    create_calendar_event,
+)
 from .tools.scoring import score
-from dotenv import load_dotenv
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import ToolNode
 
+# Optional: local audio playback (needs mpv) and the Ollama chat model
+try:
+    from elevenlabs.play import stream as play_stream
+except ImportError:
+    play_stream = None
+try:
+    from langchain_ollama import ChatOllama
+except ImportError:
+    ChatOllama = None
+
+
+load_env()
+
+logger = logging.getLogger("callpilot.graph")
+
+# Environment configuration, read once at import
+_ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+_ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb")
+_ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_flash_v2_5")
+_ELEVENLABS_OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
+_ELEVENLABS_STT_MODEL_ID = os.getenv("ELEVENLABS_STT_MODEL_ID", "scribe_v2")
+_LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama").lower()
+_OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:14b")
+_OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+_MCP_URL = os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp")
+_USE_MCP_DEFAULT = os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"}
+
+# Nearest providers called per booking, so a full calendar at the closest
+# one can fall through to the next
+_TOP_K_PROVIDERS = 3
 
 # Cache for MCP graph to avoid rebuilding
 _mcp_graph_cache = None
+# Same for the local graph
+_local_graph_cache = None
 
+# Keep-alive session shared by node-level HTTP fetches
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
-def node_listen_user(state: CallState) -> CallState:
-    """Optional speech-to-text hook (expects external STT to fill user_text)."""
-    print("\n🔹 Executing Node: listen_user")
-    user_text = state.get("user_text", "").strip()
+
+@lru_cache(maxsize=1)
+def get_elevenlabs() -> ElevenLabs:
+    """Return a shared ElevenLabs client so its TLS connection is reused across turns."""
+    return ElevenLabs(api_key=_ELEVENLABS_API_KEY)
+
+
+def _sentence_chunks(sentences: List[str]) -> Iterator[str]:
+    """Group sentences 1, 2, 4, ... at a time for synthesis.
+
+    The first sentence goes out alone so audio starts quickly; later text is
+    sent in growing batches, giving the model longer context per chunk.
+    """
+    i, size = 0, 1
+    while i < len(sentences):
+        yield " ".join(sentences[i:i + size])
+        i += size
+        size *= 2
+
+
+def _speech_audio(chunks: Iterable[str], voice_id: str, model_id: str, output_format: str) -> Iterator[bytes]:
+    """Yield audio for a stream of text chunks over one ElevenLabs input-streaming websocket.
+
+    Chunks are sent as they arrive and audio comes back while later text is
+    still being sent, so ``chunks`` can just as well be a live token stream.
+    The model keeps context across chunks, avoiding seams between sentences.
+    """
+    return get_elevenlabs().text_to_speech.convert_realtime(
+        voice_id,
+        text=iter(chunks),
+        model_id=model_id,
+        output_format=output_format,
+    )
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _first_json_object(text: str) -> Dict[str, Any] | None:
+    """Decode the first JSON object embedded in ``text`` (e.g. LLM output with prose around it)."""
+    idx = text.find("{")
+    while idx != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, idx)
+        except ValueError:
+            pass
+        else:
+            if isinstance(obj, dict):
+                return obj
+        idx = text.find("{", idx + 1)
+    return None
+
+
+async def _stream_until_json_closes(model: Any, prompt: str) -> str:
+    """Stream ``model``'s reply and stop as soon as the first JSON object closes.
+
+    Anything the model would emit after the object (trailing prose, blank
+    lines) is never generated: the stream is closed on the way out, which
+    closes the request.
+    """
+    content = ""
+    depth = 0
+    async with aclosing(model.astream(prompt)) as stream:
+        async for chunk in stream:
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            content += text
+            depth += text.count("{") - text.count("}")
+            if depth <= 0 and "{" in content:
+                break
+    return content
+
+
+_SAMPLE_AUDIO_URL = "https://storage.googleapis.com/eleven-public-cdn/audio/marketing/nicole.mp3"
+
+
+@lru_cache(maxsize=1)
+def _fetch_sample_audio() -> bytes:
+    """Download the demo STT clip once per process."""
+    response = _SESSION.get(_SAMPLE_AUDIO_URL, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def _transcribe(audio: bytes | None) -> str:
+    # Prefer caller-provided audio; the hosted sample is only a demo fallback
+    audio = audio or _fetch_sample_audio()
+    transcription = get_elevenlabs().speech_to_text.convert(
+        file=BytesIO(audio),
+        model_id=_ELEVENLABS_STT_MODEL_ID,
+        language_code="eng", # Skips language detection
+        # Speaker diarization and audio-event tags are unused downstream
+        tag_audio_events=False,
+        diarize=False,
+    )
+    return transcription.text.strip()
+
+
+async def node_listen_user(state: CallState) -> CallState:
+    """Optional speech-to-text hook.
+
+    Uses ``user_text`` when an external STT already filled it; otherwise, with
+    speech enabled, transcribes ``audio_bytes`` (or the demo sample) via ElevenLabs.
+    """
+    logger.debug("Executing node: %s", "listen_user")
+    user_text = (state.get("user_text") or "").strip()
     # if not state.get("use_speech"):
     #     try:
     #         user_text = input("Enter your request: ").strip()
@@ -37,49 +187,26 @@ def node_listen_user(state: CallState) -> CallState:
     #         user_text = None
     # else:
     #     user_text = state.get("user_text") # get from fastAPI
-    # else:
-    #     # seech to-text is expected to fill "user_text" in the state, so we just read it here
-    #     load_dotenv()
-    #     elevenlabs = ElevenLabs(
-    #     api_key=os.getenv("ELEVENLABS_API_KEY"),
-    #     )
-    #     audio_url = ("https://storage.googleapis.com/eleven-public-cdn/audio/marketing/nicole.mp3")
-    #     response = requests.get(audio_url)
-    #     audio_data = BytesIO(response.content)
-    #     transcription = elevenlabs.speech_to_text.convert(
-    #         file=audio_data,
-    #         model_id="scribe_v2", # Model to use
-    #         tag_audio_events=True, # Tag audio events like laughter, applause, etc.
-    #         language_code="eng", # Language of the audio file. If set to None, the model will detect the language automatically.
-    #         diarize=True, # Whether to annotate who is speaking
-    #     )
-    #     user_text = transcription.text.strip()
+    if not user_text and state.get("use_speech"):
+        try:
+            user_text = await asyncio.to_thread(_transcribe, state.get("audio_bytes"))
+        except Exception as e:
+            return {"error": f"Speech-to-text failed: {e}"}
 
-    transcript = state.get("transcript", []) + [f"[USER] {user_text}"]
-    return {**state, "transcript": transcript}
+    return {"transcript": [f"[USER] {user_text}"]}
 
 
-def node_speak_user(state: CallState) -> CallState:
+async def node_speak_user(state: CallState) -> CallState:
     """Optional text-to-speech hook using ElevenLabs."""
-    print("\n🔹 Executing Node: speak_user")
+    logger.debug("Executing node: %s", "speak_user")
     if not state.get("use_speech"):
-        return state
+        return {}
 
-    try:
-        from dotenv import load_dotenv
-        from elevenlabs.client import ElevenLabs
-        from elevenlabs.play import play
-    except Exception as e:
-        return {**state, "error": f"ElevenLabs import failed: {e}"}
+    if play_stream is None:
+        return {"error": "ElevenLabs import failed: elevenlabs.play is unavailable"}
 
-    load_dotenv()
-    api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
-        return {**state, "error": "Missing ELEVENLABS_API_KEY"}
-
-    voice_id = os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb")
-    model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
-    output_format = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
+    if not _ELEVENLABS_API_KEY:
+        return {"error": "Missing ELEVENLABS_API_KEY"}
 
     text = ""
     if state.get("result_text"):
@@ -89,20 +216,23 @@ def node_speak_user(state: CallState) -> CallState:
     else:
         text = "Your request is complete."
 
-    elevenlabs = ElevenLabs(api_key=api_key)
-    audio = elevenlabs.text_to_speech.convert(
-        text=text,
-        voice_id=voice_id,
-        model_id=model_id,
-        output_format=output_format,
+    # Play chunks as they arrive instead of waiting for the full MP3
+    # (playback blocks on the player process, so keep it off the event loop)
+    await asyncio.to_thread(
+        play_stream,
+        _speech_audio(
+            _sentence_chunks(split_sentences(text) or [text]),
+            _ELEVENLABS_VOICE_ID,
+            _ELEVENLABS_MODEL_ID,
+            _ELEVENLABS_OUTPUT_FORMAT,
+        ),
     )
-    play(audio)
-    return state
+    return {}
 
 
 def node_pick_provider(state: CallState) -> CallState:
     """Pick the best provider based on specialty and distance."""
-    print("\n🔹 Executing Node: pick_provider")
+    logger.debug("Executing node: %s", "pick_provider")
     specialty = state.get("specialty", "dentist")
     radius = float(state.get("radius_km", 5.0))
     user_location = state.get("user_location", "Berlin")
@@ -115,76 +245,139 @@ def node_pick_provider(state: CallState) -> CallState:
     )
     
     if not matches:
-        return {**state, "error": "No providers found in radius."}
+        return {"error": "No providers found in radius."}
 
-    provider = sorted(matches, key=lambda p: float(p.get("distance_km", 999)))[0]
-    print(f"✓ Selected: {provider.get('name', 'Unknown')}")
-    return {
-        **state, 
-        "provider": provider, 
-        "transcript": state.get("transcript", []) + [f"[SYS] Selected provider: {provider['name']}"]
-    }
+    candidates = heapq.nsmallest(
+        _TOP_K_PROVIDERS, matches, key=lambda p: float(p.get("distance_km", 999))
+    )
+    # The provider actually booked is only known once a slot is chosen
+    logger.debug("Nearest providers: %s", [p.get("name", "Unknown") for p in candidates])
+    return {"provider": candidates[0], "candidates": candidates}
 
 def node_call_provider(state: CallState) -> CallState:
-    """Simulate receptionist call to get available slots."""
-    print("\n🔹 Executing Node: call_provider")
+    """Simulate receptionist calls to the nearest providers to get available slots.
+
+    Slots are listed nearest provider first; ``slot_providers`` records which
+    provider offered each one. Each call's transcript is kept aside in
+    ``call_transcripts`` so only the chosen provider's call is logged.
+    """
+    logger.debug("Executing node: %s", "call_provider")
     if state.get("error"):
-        return state
+        return {}
     
     provider = state.get("provider")
     if not provider:
-        return {**state, "error": "No provider selected"}
+        return {"error": "No provider selected"}
     
     constraint = state.get("time_window", "this week")
-    res = simulate_receptionist_call(provider, constraint)
-    transcript = state.get("transcript", []) + res["transcript"]
-    return {**state, "proposed_slots": res["slots"], "transcript": transcript}
+    candidates = state.get("candidates") or [provider]
+    # The simulated calls are plain CPU work, so one batch call covers them all
+    results = simulate_receptionist_calls(candidates, constraint)
+    slots: List[Dict[str, str]] = []
+    owners: List[Dict[str, Any]] = []
+    for p, res in zip(candidates, results):
+        slots.extend(res.slots)
+        owners.extend([p] * len(res.slots))
+    return {
+        "proposed_slots": slots,
+        "slot_providers": owners,
+        "call_transcripts": [list(res.transcript) for res in results],
+    }
+
+
+def _call_log(state: CallState, provider: Dict[str, Any]) -> List[str]:
+    """Transcript lines for selecting ``provider`` and the call made to it."""
+    candidates = state.get("candidates") or [state.get("provider")]
+    calls = state.get("call_transcripts") or []
+    i = candidates.index(provider) if provider in candidates else len(calls)
+    return [f"[SYS] Selected provider: {provider['name']}", *(calls[i] if i < len(calls) else ())]
 
 def node_choose_slot(state: CallState) -> CallState:
     """Choose first available slot that fits user's calendar."""
-    print("\n🔹 Executing Node: choose_slot")
+    logger.debug("Executing node: %s", "choose_slot")
     if state.get("error"):
-        return state
+        return {}
     
     slots = state.get("proposed_slots", [])
     if not slots:
-        return {**state, "error": "Provider had no slots."}
+        return {"error": "Provider had no slots.", "transcript": _call_log(state, state["provider"])}
 
-    # Check each slot against calendar
-    for s in slots:
-        if check_calendar_free(s):
-            return {
-                **state, 
+    # One busy-range lookup covering every slot, then a local check per slot
+    busy = check_calendar_busy_ranges(
+        min(s["start"] for s in slots), max(s["end"] for s in slots)
+    )
+    busy_starts = [b[0] for b in busy]
+    owners = state.get("slot_providers") or []
+    for n, s in enumerate(slots):
+        # Busy blocks are merged and sorted, so only the last one starting
+        # before the slot ends can overlap it
+        i = bisect_left(busy_starts, s["end"])
+        if i == 0 or busy[i - 1][1] <= s["start"]:
+            owner = owners[n] if n < len(owners) else state["provider"]
+            logger.info("Selected provider: %s", owner.get("name", "Unknown"))
+            update = {
                 "chosen_slot": s, 
                 "calendar_ok": True,
-                "transcript": state.get("transcript", []) + [f"[SYS] Calendar ok for {s['start']}"]
+                "transcript": [*_call_log(state, owner), f"[SYS] Calendar ok for {s['start']}"]
             }
+            if owner != state.get("provider"):
+                # The slot came from a fallback candidate; book with them instead
+                update["provider"] = owner
+            return update
 
-    return {**state, "calendar_ok": False, "error": "No proposed slot fits calendar."}
+    return {
+        "calendar_ok": False,
+        "error": "No proposed slot fits calendar.",
+        "transcript": _call_log(state, state["provider"]),
+    }
 
-def node_reserve_and_book(state: CallState) -> CallState:
+async def node_reserve_and_book(state: CallState) -> CallState:
     """Reserve slot with provider and create calendar event."""
-    print("\n🔹 Executing Node: reserve_and_book")
+    logger.debug("Executing node: %s", "reserve_and_book")
     if state.get("error"):
-        return state
+        return {}
 
     provider = state.get("provider")
     slot = state.get("chosen_slot")
     
     if not provider or not slot:
-        return {**state, "error": "Missing provider or slot"}
-
-    # Reserve the slot
-    reservation_ok = reserve_slot(provider, slot)
-    if not reservation_ok:
-        return {**state, "reservation_ok": False, "error": "Reservation failed."}
-
-    # Create calendar event
-    event_id = create_calendar_event(
-        title=f"{provider['specialty'].title()} appointment - {provider['name']}",
-        slot=slot,
-        location=provider.get("address", provider.get("name", ""))
+        return {"error": "Missing provider or slot"}
+
+    # Reserve the slot and create the calendar event concurrently. Errors are
+    # collected rather than raised, so whatever the other call left behind
+    # is cleaned up before they propagate.
+    booking_id = state.get("booking_id")
+    reserved, event_id = await asyncio.gather(
+        asyncio.to_thread(reserve_slot, provider, slot, booking_id),
+        asyncio.to_thread(
+            create_calendar_event,
+            title=f"{provider['specialty'].title()} appointment - {provider['name']}",
+            slot=slot,
+            location=provider.get("address", provider.get("name", "")),
+        ),
+        return_exceptions=True,
     )
+    reserve_error = reserved if isinstance(reserved, BaseException) else None
+    if isinstance(event_id, BaseException):
+        # No event to remove; forget the reservation so a retry calls the provider again
+        invalidate_reservation(booking_id)
+        raise reserve_error or event_id
+    if reserve_error is not None or not reserved:
+        # Don't leave an event (or a remembered reservation) behind for a slot we didn't get
+        try:
+            await asyncio.to_thread(cancel_calendar_event, event_id, booking_id)
+        except Exception:
+            logger.exception("Could not remove calendar event %s after a failed reservation", event_id)
+            if reserve_error is not None:
+                raise reserve_error
+            return {
+                "reservation_ok": False,
+                "event_id": event_id,
+                "error": f"Reservation failed; calendar event {event_id} could not be removed.",
+            }
+        if reserve_error is not None:
+            raise reserve_error
+        return {"reservation_ok": False, "error": "Reservation failed."}
     
     # Score the option
     sc = score(provider, slot)
@@ -201,23 +394,20 @@ def node_reserve_and_book(state: CallState) -> CallState:
         "event_id": event_id,
     }
     
-    transcript = state.get("transcript", []) + [f"[SYS] Reserved + created event: {event_id}"]
     return {
-        **state, 
         "reservation_ok": True, 
         "event_id": event_id, 
         "result": result, 
-        "transcript": transcript
+        "transcript": [f"[SYS] Reserved + created event: {event_id}"]
     }
 
 def node_done(state: CallState) -> CallState:
     """Finalize workflow result."""
-    print("\n🔹 Executing Node: done")
+    logger.debug("Executing node: %s", "done")
     
     # Handle error case
     if state.get("error") and not state.get("result"):
         return {
-            **state, 
             "result": {
                 "status": "failed", 
                 "error": state["error"], 
@@ -230,11 +420,10 @@ def node_done(state: CallState) -> CallState:
         result = state["result"]
         result["status"] = "success"
         result["transcript"] = state.get("transcript", [])
-        return {**state, "result": result}
+        return {"result": result}
     
     # Default result
     return {
-        **state, 
         "result": {
             "status": "completed", 
             "transcript": state.get("transcript", [])
@@ -245,13 +434,71 @@ _MCP_CLIENT = None
 _MCP_TOOLS = None
 
 def get_mcp_url() -> str:
-    return os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp")
+    return _MCP_URL
+
+class _KeepAliveAsyncClient(httpx.AsyncClient):
+    """AsyncClient that outlives the ``async with`` each MCP tool call wraps it in.
+
+    The MCP transport opens and closes its HTTP client per session, i.e. per
+    tool call; making enter/exit no-ops keeps one connection pool warm instead.
+    The pool is really closed by close_mcp_http_clients(), e.g. at shutdown.
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+# Pooled clients keyed on (event loop, headers, timeout, auth): httpx clients
+# can't cross loops, and each set of factory arguments gets its own client
+_MCP_HTTP_CLIENTS: Dict[Tuple[Any, ...], httpx.AsyncClient] = {}
+
+def _mcp_http_client(
+    headers: Dict[str, str] | None = None,
+    timeout: httpx.Timeout | None = None,
+    auth: httpx.Auth | None = None,
+) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    key = (
+        loop,
+        tuple(sorted(headers.items())) if headers else (),
+        tuple(sorted(timeout.as_dict().items())) if timeout else None,
+        # The client holds on to auth, so its id stays unique while cached
+        id(auth) if auth is not None else None,
+    )
+    client = _MCP_HTTP_CLIENTS.get(key)
+    if client is None:
+        # Forget clients of loops that have been closed since
+        for stale in [k for k in _MCP_HTTP_CLIENTS if k[0].is_closed()]:
+            del _MCP_HTTP_CLIENTS[stale]
+        client = _KeepAliveAsyncClient(
+            headers=headers,
+            timeout=timeout or httpx.Timeout(30, read=300),
+            auth=auth,
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60),
+        )
+        _MCP_HTTP_CLIENTS[key] = client
+    return client
+
+async def close_mcp_http_clients() -> None:
+    """Close the pooled MCP HTTP clients bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key in [k for k in _MCP_HTTP_CLIENTS if k[0] is loop]:
+        await _MCP_HTTP_CLIENTS.pop(key).aclose()
 
 async def _get_client() -> MultiServerMCPClient:
     global _MCP_CLIENT
     if _MCP_CLIENT is None:
         _MCP_CLIENT = MultiServerMCPClient(
-            {"callpilot": {"url": get_mcp_url(), "transport": "http"}}
+            {
+                "callpilot": {
+                    "url": get_mcp_url(),
+                    "transport": "http",
+                    "httpx_client_factory": _mcp_http_client,
+                }
+            }
         )
     return _MCP_CLIENT
 
@@ -262,9 +509,24 @@ async def _get_tools_async():
         _MCP_TOOLS = await client.get_tools()
     return _MCP_TOOLS
 
+@lru_cache(maxsize=1)
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return a long-lived event loop running in a daemon thread.
+
+    Sync callers submit coroutines here instead of spinning up (or nesting)
+    a loop per call, so the MCP client always lives on the same loop.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="callpilot-loop", daemon=True).start()
+    return loop
+
+def run_sync(coro):
+    """Run ``coro`` on the background loop and block for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
 def get_tools_sync():
     """Use this in CLI mode (python main.py)."""
-    return asyncio.run(_get_tools_async())
+    return run_sync(_get_tools_async())
 
 def build_graph_mcp(mcp_tools: List[dict] | None = None):
     """Build and compile the LLM + MCP tool-calling graph."""
@@ -274,19 +536,13 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
     if _mcp_graph_cache is not None:
         return _mcp_graph_cache
     
-    load_dotenv()
-
-    default_mcp_url = os.getenv("MCP_URL", "http://localhost:8000/mcp")
-    llm_provider = os.getenv("LLM_PROVIDER", "ollama").lower()
     # default_openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    default_ollama_model = os.getenv("OLLAMA_MODEL", "qwen2.5:14b")
-    default_ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 
     # async def get_mcp_client():
     #     return MultiServerMCPClient(
     #         {
     #             "callpilot": {
-    #                 "url": default_mcp_url,
+    #                 "url": _MCP_URL,
     #                 "transport": "http",
     #             }
     #         }
@@ -296,11 +552,30 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
     #     client = await get_mcp_client()
     #     return await client.get_tools()
 
-    # No event loop running, safe to use asyncio.run
-    # tools = asyncio.run(get_mcp_tools())
-    tools = mcp_tools
+    # Callers without preloaded tools (CLI) fetch them on the background loop
+    tools = mcp_tools if mcp_tools is not None else get_tools_sync()
+
+    # Build the LLM clients once per graph; every node call reuses them, and the
+    # tool schemas are bound (serialized) once instead of per agent turn
+    if _LLM_PROVIDER == "ollama":
+        if ChatOllama is None:
+            raise ImportError("langchain-ollama is required when LLM_PROVIDER=ollama")
+        extraction_model = ChatOllama(
+            model=_OLLAMA_MODEL,
+            base_url=_OLLAMA_BASE_URL,
+            temperature=0.1,  # Low temperature for consistent extraction
+            num_predict=256,  # The JSON answer is short; cap runaway generations
+        )
+        agent_model = ChatOllama(
+            model=_OLLAMA_MODEL,
+            base_url=_OLLAMA_BASE_URL,
+            temperature=0.4,
+        ).bind_tools(tools)
+    # else:
+    #     from langchain_openai import ChatOpenAI
+    #     extraction_model = ChatOpenAI(model=default_openai_model, temperature=0.1)
     
-    def node_extract_preferences(state: CallState) -> CallState:
+    async def node_extract_preferences(state: CallState) -> CallState:
         """Extract appointment preferences from user's natural language query.
         
         Uses LLM to parse user input and extract structured information like:
@@ -310,7 +585,7 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
         - Specific provider names
         - Other booking preferences
         """
-        print("\n🔹 Executing Node: extract_preferences")
+        logger.debug("Executing node: %s", "extract_preferences")
         user_text = state.get("user_text", "")
         
         # Skip extraction if no user text
@@ -326,20 +601,8 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
             if not state.get("user_location"):
                 updates["user_location"] = "Berlin"
             if updates:
-                return {**state, **updates}
-            return state
-        
-        # Initialize LLM for extraction
-        if llm_provider == "ollama":
-            from langchain_ollama import ChatOllama
-            extraction_model = ChatOllama(
-                model=default_ollama_model,
-                base_url=default_ollama_url,
-                temperature=0.1,  # Low temperature for consistent extraction
-            )
-        # else:
-        #     from langchain_openai import ChatOpenAI
-        #     extraction_model = ChatOpenAI(model=default_openai_model, temperature=0.1)
+                return updates
+            return {}
         
         # Create extraction prompt
         extraction_prompt = f"""You are extracting structured appointment preferences from a user's request.
@@ -372,17 +635,11 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
         """
 
         try:
-            response = extraction_model.invoke(extraction_prompt)
-            content = response.content.strip()
-            
-            # Extract JSON from response
-            import json
-            import re
+            content = (await _stream_until_json_closes(extraction_model, extraction_prompt)).strip()
             
             # Try to find JSON in the response
-            json_match = re.search(r'\{[^{}]*\}', content, re.DOTALL)
-            if json_match:
-                extracted = json.loads(json_match.group())
+            extracted = _first_json_object(content)
+            if extracted is not None:
                 
                 # Update state with extracted values (only if not already set)
                 updates = {}
@@ -422,11 +679,11 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
                     updates["user_location"] = "Berlin"
                 
                 if updates:
-                    print(f"✓ Extracted preferences: {updates}")
-                    return {**state, **updates}
+                    logger.info("Extracted preferences: %s", updates)
+                    return updates
             
         except Exception as e:
-            print(f"⚠️  Preference extraction failed: {e}")
+            logger.warning("Preference extraction failed: %s", e)
         
         # Fallback: set defaults if extraction failed
         updates = {}
@@ -440,14 +697,14 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
             updates["user_location"] = "Berlin"
         
         if updates:
-            print(f"✓ Using defaults: {updates}")
-            return {**state, **updates}
+            logger.info("Using default preferences: %s", updates)
+            return updates
         
-        return state
+        return {}
 
     def node_init_messages(state: CallState) -> CallState:
         if state.get("messages"):
-            return state
+            return {}
 
         specialty = state.get("specialty", "dentist")
         time_window = state.get("time_window", "this week")
@@ -497,22 +754,15 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
                 "The calendar event will be created automatically - you don't need to create it."
             )
         )
-        return {**state, "messages": [system, user]}
-
-    def node_agent(state: CallState) -> CallState:
-        # Initialize model
-        if llm_provider == "ollama":
-            from langchain_ollama import ChatOllama
-            model = ChatOllama(
-                model=default_ollama_model,
-                base_url=default_ollama_url,
-                temperature=0.4,
-            )
-        
-        model = model.bind_tools(tools)
-        
+        return {"messages": [system, user]}
+
+    async def node_agent(state: CallState) -> CallState:
+        # Use existing messages (contains tool results from previous iterations)
+        messages = state.get("messages")
+        new_messages = []
+
         # Initialize messages if this is the first call
-        if "messages" not in state or not state["messages"]:
+        if not messages:
             sys_prompt = f"""You are CallPilot, an AI appointment-booking assistant.
 
             Current booking request:
@@ -547,41 +797,44 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
 
             Use the tools to complete this booking."""
                         
-            state["messages"] = [
+            new_messages = [
                 SystemMessage(content=sys_prompt),
                 HumanMessage(content=user_prompt)
             ]
-        
-        # Use existing messages (contains tool results from previous iterations)
-        messages = state["messages"]
+            messages = new_messages
         
         # Invoke model with full conversation history
-        resp = model.invoke(messages)
+        resp = await agent_model.ainvoke(messages)
         
         # Debug: log tool calls if present
-        if hasattr(resp, 'tool_calls') and resp.tool_calls:
-            print(f"🔧 Agent requesting {len(resp.tool_calls)} tool call(s):")
+        if logger.isEnabledFor(logging.DEBUG) and getattr(resp, "tool_calls", None):
+            logger.debug("Agent requesting %d tool call(s)", len(resp.tool_calls))
             for tc in resp.tool_calls:
-                print(f"   - {tc.get('name', 'unknown')} with args: {tc.get('args', {})}")
+                logger.debug("  - %s with args: %s", tc.get("name", "unknown"), tc.get("args", {}))
         
-        # Append response to message history
-        state["messages"] = messages + [resp]
+        # Append response to message history (the reducer on CallState.messages appends)
+        update = {"messages": new_messages + [resp]}
 
-        # Try to parse JSON summary from the response content
+        # Try to parse JSON summary from the response content. Tool-call turns
+        # usually have empty content, so only attempt it when it looks like JSON.
+        content = resp.content.lstrip() if isinstance(resp.content, str) else ""
         summary = None
-        try:
-            summary = json.loads(resp.content)
-        except Exception:
+        if content.startswith("{"):
+            try:
+                summary = json.loads(content)
+            except ValueError:
+                summary = None
+        if isinstance(summary, dict):
+            update["best_option"] = summary
+        elif content and not getattr(resp, "tool_calls", None) and not state.get("best_option"):
             # fallback: keep raw content, you can add a "repair json" step later
-            summary = {"raw": resp.content}
-
-        state["best_option"] = summary
-        return state
+            update["best_option"] = {"raw": content}
+        return update
 
     def node_finalize(state: CallState) -> CallState:
         last = state["messages"][-1]
         result_text = getattr(last, "content", "")
-        return {**state, "result_text": result_text}
+        return {"result_text": result_text}
 
     def check_calendar_free_tool(start: str, end: str) -> dict:
         """Check if a time slot is free in the user's calendar.
@@ -599,13 +852,13 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
         ok = check_calendar_free({"start": start, "end": end})
         return ok
 
-    def node_create_calendar_event(state: CallState) -> CallState:
+    async def node_create_calendar_event(state: CallState) -> CallState:
         """Automatically create calendar event after LLM finds best appointment.
         
         Extracts appointment details from tool results and creates calendar event.
         This runs automatically - not an LLM-callable tool.
         """
-        print("\n🔹 Executing Node: create_calendar_event")
+        logger.debug("Executing node: %s", "create_calendar_event")
         
         appointment_details = state.get("best_option", {})
         
@@ -618,10 +871,8 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
         )
         
         if not has_valid_appointment:
-            print("⚠️  No valid appointment found - creating dummy appointment")
+            logger.warning("No valid appointment found - creating dummy appointment")
             # Create dummy appointment as fallback
-            from datetime import datetime, timedelta
-            
             # Generate a dummy slot for tomorrow at 10 AM
             tomorrow = datetime.now() + timedelta(days=1)
             dummy_start = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
@@ -641,41 +892,42 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
                 },
                 "score": 0
             }
-            state["best_option"] = appointment_details
-            print(f"   Dummy appointment: {appointment_details['provider']['name']} at {dummy_start.strftime('%Y-%m-%d %H:%M')}")
+            logger.info(
+                "Dummy appointment: %s at %s",
+                appointment_details["provider"]["name"],
+                dummy_start.strftime("%Y-%m-%d %H:%M"),
+            )
         
         start = appointment_details.get("slot", {}).get("start")
         end = appointment_details.get("slot", {}).get("end")
         
         if start and end:
-            ok = check_calendar_free_tool(start, end)
-            
-            if ok:
-                print(f"✓ Slot is free in calendar: {start} to {end}")
-            else:
-                print(f"⚠️  Slot is NOT free in calendar: {start} to {end}")
-            
             # Extract details
             provider = appointment_details["provider"]
             slot = appointment_details["slot"]
             
-            # Create calendar event regardless of calendar availability
+            # Create calendar event regardless of calendar availability,
+            # so the availability check runs alongside it
             title = f"{state.get('specialty', 'Medical').title()} Appointment - {provider['name']}"
             location = provider.get("address", "")
             
-            event_id = create_calendar_event(
-                title=title,
-                slot=slot,
-                location=location
+            ok, event_id = await asyncio.gather(
+                asyncio.to_thread(check_calendar_free_tool, start, end),
+                asyncio.to_thread(create_calendar_event, title=title, slot=slot, location=location),
             )
             
-            print(f"✓ Calendar event created: {event_id}")
+            if ok:
+                logger.info("Slot is free in calendar: %s to %s", start, end)
+            else:
+                logger.warning("Slot is NOT free in calendar: %s to %s", start, end)
+            
+            logger.info("Calendar event created: %s", event_id)
         else:
-            print("⚠️  Invalid slot times, cannot create calendar event")
+            logger.warning("Invalid slot times, cannot create calendar event")
             event_id = None
         
-        # Update state with event_id
-        return {**state, "event_id": event_id}
+        # Update state with event_id (and the fallback appointment, if one was made)
+        return {"best_option": appointment_details, "event_id": event_id}
 
     def route_after_agent(state: CallState) -> str:
         last = state["messages"][-1]
@@ -715,7 +967,7 @@ def build_graph_mcp(mcp_tools: List[dict] | None = None):
 def build_graph(use_mcp: bool | None = None, mcp_tools: List[dict] | None = None):
     """Build and compile the appointment booking graph."""
     if use_mcp is None:
-        use_mcp = os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"}
+        use_mcp = _USE_MCP_DEFAULT
     if use_mcp:
         return build_graph_mcp(mcp_tools)
     return build_graph_local()
@@ -723,6 +975,12 @@ def build_graph(use_mcp: bool | None = None, mcp_tools: List[dict] | None = None
 
 def build_graph_local():
     """Build and compile the local (non-LLM) appointment booking graph."""
+    global _local_graph_cache
+
+    # Return cached graph if available
+    if _local_graph_cache is not None:
+        return _local_graph_cache
+
     g = StateGraph(CallState)
     g.add_node("pick_provider", node_pick_provider)
     g.add_node("call_provider", node_call_provider)
@@ -737,14 +995,28 @@ def build_graph_local():
     g.add_edge("reserve_and_book", "done")
     g.add_edge("done", END)
 
-    return g.compile()
+    # Cache the compiled graph
+    _local_graph_cache = g.compile()
+    return _local_graph_cache
+
+
+def _apply_update(state: Dict[str, Any], update: Dict[str, Any]) -> None:
+    """Merge a node's partial update into ``state`` in place, as the graph would.
+
+    ``transcript`` lines are appended (mirroring the reducer on CallState);
+    every other key is overwritten.
+    """
+    transcript = state.get("transcript", [])
+    state.update(update)
+    if "transcript" in update:
+        state["transcript"] = transcript + update["transcript"]
 
 
 def run_local_proposal(init_state: CallState) -> CallState:
     """Run the local flow up to a proposed slot (no booking)."""
-    state = node_pick_provider(init_state)
-    state = node_call_provider(state)
-    state = node_choose_slot(state)
+    state = dict(init_state)
+    for node in (node_pick_provider, node_call_provider, node_choose_slot):
+        _apply_update(state, node(state))
 
     proposal = {
         "provider": state.get("provider"),
@@ -753,11 +1025,13 @@ def run_local_proposal(init_state: CallState) -> CallState:
         "error": state.get("error"),
         "transcript": state.get("transcript", []),
     }
-    return {**state, "proposal": proposal}
+    state["proposal"] = proposal
+    return state
 
 
-def confirm_local_booking(state: CallState) -> CallState:
+async def confirm_local_booking(state: CallState) -> CallState:
     """Finalize booking and calendar event for a proposed slot."""
-    state = node_reserve_and_book(state)
-    state = node_done(state)
+    state = dict(state)
+    _apply_update(state, await node_reserve_and_book(state))
+    _apply_update(state, node_done(state))
     return state
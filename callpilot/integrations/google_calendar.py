@@ -9,7 +9,7 @@ import os
 import pickle
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -131,6 +131,48 @@ def check_calendar_availability(start_time: str, end_time: str, calendar_id: str
         return True
 
 
+def get_busy_ranges(time_min: str, time_max: str, calendar_id: str = 'primary') -> List[Tuple[str, str]]:
+    """Fetch all busy intervals between two timestamps in one free/busy query.
+    
+    Args:
+        time_min: ISO 8601 timestamp for the start of the window
+        time_max: ISO 8601 timestamp for the end of the window
+        calendar_id: Calendar to check (default: 'primary' for main calendar)
+    
+    Returns:
+        List of (start, end) ISO 8601 pairs in UTC, formatted like the
+        inputs (a trailing 'Z' is only kept if the inputs had one).
+        Empty if the API call fails, matching check_calendar_availability's
+        assume-available fallback.
+    """
+    try:
+        service = get_calendar_service()
+        
+        naive = 'T' in time_min and '+' not in time_min and 'Z' not in time_min
+        if naive:
+            time_min += 'Z'  # Assume UTC for simplicity
+            time_max += 'Z'
+        
+        result = service.freebusy().query(body={
+            'timeMin': time_min,
+            'timeMax': time_max,
+            'timeZone': 'UTC',
+            'items': [{'id': calendar_id}],
+        }).execute()
+        
+        busy = result.get('calendars', {}).get(calendar_id, {}).get('busy', [])
+        if naive:
+            return [(b['start'].rstrip('Z'), b['end'].rstrip('Z')) for b in busy]
+        return [(b['start'], b['end']) for b in busy]
+        
+    except HttpError as error:
+        print(f"Google Calendar API error: {error}")
+        return []
+    except FileNotFoundError as e:
+        print(f"Calendar authentication error: {e}")
+        return []
+
+
 def create_calendar_event(
     title: str,
     start_time: str,
@@ -209,6 +251,28 @@ def create_calendar_event(
         return f"mvp_event::{title}::{start_time}"
 
 
+def delete_calendar_event(event_id: str, calendar_id: str = 'primary') -> bool:
+    """Delete an event from the user's Google Calendar.
+    
+    Args:
+        event_id: ID returned by create_calendar_event
+        calendar_id: Calendar the event lives in (default: 'primary')
+    
+    Returns:
+        True if the event was deleted, False otherwise.
+    """
+    try:
+        service = get_calendar_service()
+        service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
+        return True
+    except HttpError as error:
+        print(f"Google Calendar API error: {error}")
+        return False
+    except FileNotFoundError as e:
+        print(f"Calendar authentication error: {e}")
+        return False
+
+
 def list_upcoming_events(max_results: int = 10, calendar_id: str = 'primary') -> List[Dict]:
     """List upcoming events from the user's calendar.
     
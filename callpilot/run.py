@@ -1,11 +1,22 @@
 from __future__ import annotations
 import json
+import logging
 import os
 import asyncio
 from callpilot.graph import build_graph
 
 
+async def _last_value(app, init_state):
+    """Return the last state streamed by ``app``."""
+    final_state = {}
+    async for value in app.astream(init_state, stream_mode="values"):
+        if value is not None:
+            final_state = value
+    return final_state
+
+
 def main(export_png: bool = False, use_speech: bool = False):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     use_mcp = os.getenv("USE_MCP", "").lower() in {"1", "true", "yes", "y"}
     app = build_graph(use_mcp=use_mcp)
 
@@ -31,17 +42,11 @@ def main(export_png: bool = False, use_speech: bool = False):
 
     print(f"\n[DEBUG] Initial state keys: {list(init_state.keys())}")
     
-    # Run workflow and get final state
-    if use_mcp:
-        final_state = asyncio.run(app.ainvoke(init_state))
-    else:
-        final_state = app.invoke(init_state)
-        if final_state is None:
-            # Fallback for older langgraph versions
-            final_state = {}
-            for value in app.stream(init_state, stream_mode="values"):
-                if value is not None:
-                    final_state = value
+    # Run workflow and get final state (both graphs have async nodes)
+    final_state = asyncio.run(app.ainvoke(init_state))
+    if final_state is None:
+        # Fallback for older langgraph versions
+        final_state = asyncio.run(_last_value(app, init_state))
     print(f"[DEBUG] Final state type: {type(final_state)}")
     
     print("\n" + "="*60)
@@ -61,22 +66,8 @@ def main(export_png: bool = False, use_speech: bool = False):
                 state_data = only_value
         if state_data and "branch:to:done" in state_data:
             # Fallback: run the local nodes directly to recover final result
-            from callpilot.graph import (
-                node_pick_provider,
-                node_call_provider,
-                node_choose_slot,
-                node_reserve_and_book,
-                node_done,
-            )
-            state_data = init_state
-            for fn in (
-                node_pick_provider,
-                node_call_provider,
-                node_choose_slot,
-                node_reserve_and_book,
-                node_done,
-            ):
-                state_data = fn(state_data)
+            from callpilot.graph import confirm_local_booking, run_local_proposal
+            state_data = asyncio.run(confirm_local_booking(run_local_proposal(init_state)))
         if not state_data:
             print("ERROR: Empty final state")
             return
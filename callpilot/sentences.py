@@ -0,0 +1,33 @@
+"""Sentence splitting for text-to-speech.
+
+Shared by the graph's spoken replies and the Streamlit UI, so a reply is
+cut into the same sentences on both paths.
+"""
+
+from __future__ import annotations
+import re
+from typing import List
+
+# Sentence end: terminal punctuation followed by whitespace or end of text
+# (so decimals like "4.5" never match), except after common abbreviations
+# ("Dr. Smith", "3 PM. on Monday", "3 p.m. works" stay one sentence)
+SENTENCE_END = re.compile(
+    r"(?<!\bDr)(?<!\bMr)(?<!\bMrs)(?<!\bMs)(?<!\bSt)(?<!\bvs)"
+    r"(?<!\b[AaPp][Mm])(?<!\b[AaPp]\.[Mm])[.!?](?=\s|$)"
+)
+# Shorter fragments are merged into the following sentence
+MIN_SENTENCE_LEN = 10
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split ``text`` into speakable sentences, keeping any trailing fragment."""
+    out = []
+    i = 0
+    for m in SENTENCE_END.finditer(text):
+        j = m.end()
+        if j - i >= MIN_SENTENCE_LEN:
+            out.append(text[i:j].strip())
+            i = j
+    if text[i:].strip():
+        out.append(text[i:].strip())
+    return out
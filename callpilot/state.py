@@ -6,7 +6,10 @@ progresses through the appointment booking process.
 """
 
 from __future__ import annotations
-from typing import TypedDict, Optional, List, Dict, Any
+import operator
+from typing import Annotated, TypedDict, Optional, List, Dict, Any
+
+from langgraph.graph.message import add_messages
 
 class CallState(TypedDict, total=False):
     """State object for the appointment booking workflow.
@@ -21,21 +24,29 @@ class CallState(TypedDict, total=False):
         user_location: User's location string (e.g., "Berlin", "Munich")
 
         provider: Dict[str, Any]  # Selected provider after matching
+        candidates: List[Dict[str, Any]]  # Nearest providers called for slots (selected one first)
         
         proposed_slots: List[Dict[str, str]]  # Time slots offered by provider
                                                # Format: [{"start": ISO8601, "end": ISO8601}, ...]
+        slot_providers: List[Dict[str, Any]]  # Provider offering each proposed slot (same order)
+        call_transcripts: List[List[str]]  # Transcript of the call to each candidate (same order)
         chosen_slot: Optional[Dict[str, str]]  # Final selected slot from proposed options
+        booking_id: Optional[str]   # Idempotency key for confirming this proposal
         
         calendar_ok: bool           # Whether chosen slot is free in user's calendar
         reservation_ok: bool        # Whether provider successfully reserved the slot
         event_id: Optional[str]     # Calendar event ID after booking
         
-        transcript: List[str]       # Conversation log for debugging and display
+        transcript: List[str]       # Conversation log for debugging and display;
+                                    # nodes return only new lines, which are appended
         result: Dict[str, Any]      # Final booking result with all details
-        messages: List[Any]         # LangChain messages for LLM + tool calling
+        messages: List[Any]         # LangChain messages for LLM + tool calling;
+                                    # nodes return only new messages, which are appended
         result_text: Optional[str]  # Final LLM summary (JSON string expected)
+        best_option: Dict[str, Any] # Parsed appointment summary from the LLM agent
         use_speech: bool            # Enable ElevenLabs speech I/O
         user_text: Optional[str]    # External STT result (if use_speech)
+        audio_bytes: Optional[bytes] # Recorded user audio to transcribe (if use_speech)
         error: Optional[str]        # Error message if workflow fails
     """
 
@@ -47,8 +58,12 @@ class CallState(TypedDict, total=False):
 
     # Provider selection + slots
     provider: Dict[str, Any]
+    candidates: List[Dict[str, Any]]
     proposed_slots: List[Dict[str, str]]
+    slot_providers: List[Dict[str, Any]]
+    call_transcripts: List[List[str]]
     chosen_slot: Optional[Dict[str, str]]
+    booking_id: Optional[str]
 
     # Booking + calendar
     calendar_ok: bool
@@ -56,16 +71,18 @@ class CallState(TypedDict, total=False):
     event_id: Optional[str]
 
     # Logging + result
-    transcript: List[str]
+    transcript: Annotated[List[str], operator.add]
     result: Dict[str, Any]
 
     # LLM/MCP fields
-    messages: List[Any]
+    messages: Annotated[List[Any], add_messages]
     result_text: Optional[str]
+    best_option: Dict[str, Any]
 
     # Speech I/O
     use_speech: bool
     user_text: Optional[str]
+    audio_bytes: Optional[bytes]
 
     # Extracted preferences from natural language
     preferred_provider: Optional[str]
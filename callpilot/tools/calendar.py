@@ -6,8 +6,9 @@ or MVP stubs based on configuration.
 """
 
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, List, Tuple
 
+from ..adapters.receptionist_sim import invalidate_reservation
 from ..config import settings
 
 # MVP: Hard-coded busy slots for testing
@@ -50,6 +51,45 @@ def check_calendar_free(slot: Dict[str, str]) -> bool:
     return True
 
 
+def check_calendar_busy_ranges(start_min: str, end_max: str) -> List[Tuple[str, str]]:
+    """Return the busy periods overlapping a time window, in one lookup.
+    
+    Lets callers test many candidate slots against the calendar with a
+    single API round trip instead of one check_calendar_free call each.
+    
+    Args:
+        start_min: ISO 8601 start of the window (earliest slot start)
+        end_max: ISO 8601 end of the window (latest slot end)
+    
+    Returns:
+        Sorted, non-overlapping (start, end) pairs; adjacent or overlapping
+        busy blocks are merged so callers can bisect on the start times.
+    """
+    ranges = None
+    if settings.use_google_apis:
+        try:
+            from ..integrations.google_calendar import get_busy_ranges
+            ranges = get_busy_ranges(start_min, end_max)
+        except Exception as e:
+            print(f"Google Calendar API error, falling back to MVP: {e}")
+            # Fall through to MVP implementation
+    
+    # MVP implementation
+    if ranges is None:
+        ranges = [
+            (b["start"], b["end"]) for b in BUSY
+            if not (end_max <= b["start"] or start_min >= b["end"])
+        ]
+    
+    merged: List[Tuple[str, str]] = []
+    for s, e in sorted(ranges):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
 def create_calendar_event(title: str, slot: Dict[str, str], location: str) -> str:
     """Create a calendar event for the booked appointment.
     
@@ -84,3 +124,26 @@ def create_calendar_event(title: str, slot: Dict[str, str], location: str) -> st
     # MVP implementation
     return f"demo_event::{title}::{slot['start']}"
 
+
+
+def cancel_calendar_event(event_id: str | None, booking_id: str | None = None) -> None:
+    """Remove an event created by create_calendar_event.
+    
+    Demo/MVP event IDs have nothing to delete; Google events are removed
+    when the API is configured. The booking's cached reservation is
+    forgotten first, so a later confirmation calls the provider again.
+    
+    Args:
+        event_id: Event ID returned by create_calendar_event (may be None)
+        booking_id: Idempotency key the slot was reserved under, if any
+    
+    Raises:
+        Exception: If the Google Calendar API fails to delete the event, so
+                   callers can report the event that was left behind.
+    """
+    invalidate_reservation(booking_id)
+    if not event_id or event_id.startswith(("demo_event::", "mvp_event::")):
+        return
+    if settings.use_google_apis:
+        from ..integrations.google_calendar import delete_calendar_event
+        delete_calendar_event(event_id)
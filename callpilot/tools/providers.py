@@ -7,9 +7,19 @@ with a local JSON fallback for demo mode.
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List
+import sys
+import threading
+from typing import Any, Dict, List, Tuple
+
+from cachetools import TTLCache
+
 from ..config import settings
 
+# Search results per (specialty, radius_km, user_location); the catalog and
+# geocoding results are effectively static within a session
+_SEARCH_CACHE: TTLCache = TTLCache(maxsize=256, ttl=300)
+_SEARCH_LOCK = threading.Lock()
+
 
 def load_providers() -> List[Dict[str, Any]]:
     """Load all providers from the JSON database.
@@ -18,7 +28,12 @@ def load_providers() -> List[Dict[str, Any]]:
     and returns the complete list of providers.
     """
     with open(settings.providers_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        providers = json.load(f)
+    # Names are hashed and compared across many layers; intern them once here
+    for p in providers:
+        if isinstance(p.get("name"), str):
+            p["name"] = sys.intern(p["name"])
+    return providers
 
 
 def _search_local_providers(
@@ -34,6 +49,12 @@ def _search_local_providers(
     return matches
 
 
+def _remember(key: Tuple[str, float, str], matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with _SEARCH_LOCK:
+        _SEARCH_CACHE[key] = matches
+    return list(matches)
+
+
 def search_providers(
     specialty: str,
     radius_km: float,
@@ -56,9 +77,18 @@ def search_providers(
         >>> dentists = search_providers("dentist", 5.0, "Berlin, Germany")
         >>> print(f"Found {len(dentists)} dentists within 5km")
         Found 2 dentists within 5km
+    
+    Results are cached for a few minutes per (specialty, radius, location);
+    callers get a fresh list each time, so sorting or trimming it is safe.
     """
+    key = (specialty, float(radius_km), user_location)
+    with _SEARCH_LOCK:
+        cached = _SEARCH_CACHE.get(key)
+    if cached is not None:
+        return list(cached)
+
     if not settings.use_google_apis:
-        return _search_local_providers(specialty=specialty, radius_km=radius_km)
+        return _remember(key, _search_local_providers(specialty=specialty, radius_km=radius_km))
 
     try:
         from ..integrations.google_places import search_medical_providers
@@ -73,7 +103,7 @@ def search_providers(
         )
 
         if not providers:
-            return []
+            return _remember(key, [])
 
         # Calculate distances
         destinations = [p.get("address") for p in providers if p.get("address")]
@@ -93,7 +123,8 @@ def search_providers(
         # Filter by radius and sort by distance
         enriched = [p for p in enriched if float(p.get("distance_km", 999)) <= radius_km]
         enriched.sort(key=lambda x: float(x.get("distance_km", 999)))
-        return enriched
+        return _remember(key, enriched)
     except Exception:
         # Fallback to local JSON if Google APIs are unavailable.
+        # Not cached, so the next search retries Google.
         return _search_local_providers(specialty=specialty, radius_km=radius_km)
@@ -6,10 +6,9 @@ def score(provider: Dict[str, Any], slot: Dict[str, str]) -> Dict[str, Any]:
     rating = float(provider.get("rating", 0))
     dist = float(provider.get("distance_km", 999))
 
-    # Convert time to a sortable measure (lexicographic ISO is fine for MVP)
-    time_score = 1.0 / (1.0 + 0.000001)  # placeholder to keep formula obvious
-    # Instead: just store the slot start as “priority”; we’ll output explanation rather than strict math.
-    total = rating * 2.0 + (1.0 / (1.0 + dist)) * 3.0
+    # Slot time isn't part of the total: we just store the slot start as “priority”
+    # and output an explanation rather than strict math.
+    total = rating * 2.0 + 3.0 / (1.0 + dist)
 
     return {
         "total": round(total, 3),
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Tests for the FastAPI backend, without a running MCP server."""
+
+import os
+import sys
+from pathlib import Path
+
+# Local workflow against the MVP stubs, never the real Google APIs
+os.environ["USE_GOOGLE_APIS"] = "false"
+os.environ["USE_MCP"] = "false"
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+
+import orjson
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, StateGraph
+
+import api
+from callpilot.state import CallState
+
+# No `with` block: the startup hook would fetch tools from the MCP server
+client = TestClient(api.app)
+
+
+_run_local_proposal = api.run_local_proposal
+
+
+def _count_proposals():
+    """Wrap run_local_proposal with a counter; returns the list of calls made.
+
+    Callers restore ``api.run_local_proposal`` when done.
+    """
+    calls = []
+
+    def counting(init_state):
+        calls.append(init_state)
+        return _run_local_proposal(init_state)
+
+    api.run_local_proposal = counting
+    api._PROPOSAL_CACHE.clear()
+    return calls
+
+
+def test_propose_confirm_propose():
+    """Confirming a proposal drops it from the cache, so the next proposal is recomputed."""
+    calls = _count_proposals()
+    try:
+        first = client.post("/propose", json={}).json()
+        again = client.post("/propose", json={}).json()
+        assert len(calls) == 1, "identical proposals should be served from the cache"
+        assert again["proposal"]["slot"] == first["proposal"]["slot"]
+        # Each response carries its own confirmation key
+        assert again["state"]["booking_id"] != first["state"]["booking_id"]
+
+        state = first["state"]
+        resp = client.post("/confirm", json={
+            "provider": state["provider"],
+            "slot": state["chosen_slot"],
+            "booking_id": state["booking_id"],
+        })
+        assert resp.status_code == 200
+        assert resp.json()["result"]["status"] == "success"
+
+        client.post("/propose", json={})
+        assert len(calls) == 2, "a booked slot must not be proposed from the cache"
+    finally:
+        api.run_local_proposal = _run_local_proposal
+
+
+def test_chat_confirm_evicts_proposal():
+    """/chat/confirm drops the booked proposal from the cache too."""
+    calls = _count_proposals()
+    try:
+        state = client.post("/propose", json={}).json()["state"]
+        resp = client.post("/chat/confirm", json={
+            "provider": state["provider"],
+            "slot": state["chosen_slot"],
+            "booking_id": state["booking_id"],
+        })
+        assert resp.json()["event_id"]
+        client.post("/propose", json={})
+        assert len(calls) == 2
+    finally:
+        api.run_local_proposal = _run_local_proposal
+
+
+def _sse_events(resp):
+    """Decode the data payloads of a server-sent event stream."""
+    return [orjson.loads(line[6:]) for line in resp.iter_lines() if line.startswith("data: ")]
+
+
+def test_chat_stream_local():
+    """The local workflow streams a status event, its message, then the full body."""
+    with client.stream("POST", "/chat/stream", json={"message": "dentist", "use_mcp": False}) as resp:
+        events = _sse_events(resp)
+    assert events[0] == {"status": "processing"}
+    done = events[-1]
+    assert done["done"] is True
+    assert "".join(e["token"] for e in events if "token" in e) == done["message"]
+
+
+def _fake_agent_graph(reply):
+    """A stand-in for the MCP graph: an agent node answering with ``reply``, then finalize."""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=reply)]))
+
+    async def agent(state):
+        return {"messages": [await model.ainvoke(state["messages"] or "hi")]}
+
+    def finalize(state):
+        return {"result_text": state["messages"][-1].content}
+
+    g = StateGraph(CallState)
+    g.add_node("agent", agent)
+    g.add_node("finalize", finalize)
+    g.set_entry_point("agent")
+    g.add_edge("agent", "finalize")
+    g.add_edge("finalize", END)
+    return g.compile()
+
+
+def test_chat_stream_mcp_streams_model_tokens():
+    """In MCP mode, token events are the agent model's chunks, sent as they are generated."""
+    reply = "Booked Mitte Dental for Monday at 3 p.m."
+    get_graph = api._get_graph
+    api._get_graph = lambda use_mcp: _fake_agent_graph(reply)
+    api.app.state.mcp_semaphore = asyncio.Semaphore(1)
+    try:
+        with client.stream("POST", "/chat/stream", json={"message": "book a dentist", "use_mcp": True}) as resp:
+            events = _sse_events(resp)
+    finally:
+        api._get_graph = get_graph
+    tokens = [e["token"] for e in events if "token" in e]
+    # The fake model emits one chunk per word, so the reply arrives in pieces
+    assert len(tokens) > 1
+    assert "".join(tokens) == reply
+    assert events[-1]["done"] is True and events[-1]["message"] == reply
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_propose_confirm_propose,
+        test_chat_confirm_evicts_proposal,
+        test_chat_stream_local,
+        test_chat_stream_mcp_streams_model_tokens,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
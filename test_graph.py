@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Tests for the local (non-LLM) booking graph."""
+
+import asyncio
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+# MVP stubs only, never the real Google APIs
+os.environ["USE_GOOGLE_APIS"] = "false"
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import AIMessageChunk
+
+import callpilot.graph as graph
+
+NEAR = {
+    "id": "p1", "name": "Near Dental", "specialty": "dentist", "distance_km": 1.0,
+    "openings": [{"start": "2026-02-10T15:00:00", "end": "2026-02-10T15:30:00"}],
+}
+MID = {
+    "id": "p2", "name": "Mid Dental", "specialty": "dentist", "distance_km": 2.0,
+    "openings": [{"start": "2026-02-11T14:00:00", "end": "2026-02-11T14:30:00"}],
+}
+FAR = {
+    "id": "p3", "name": "Far Dental", "specialty": "dentist", "distance_km": 3.0,
+    "openings": [{"start": "2026-02-12T14:00:00", "end": "2026-02-12T14:30:00"}],
+}
+TOO_FAR = {
+    "id": "p4", "name": "Too Far Dental", "specialty": "dentist", "distance_km": 4.0,
+    "openings": [{"start": "2026-02-09T14:00:00", "end": "2026-02-09T14:30:00"}],
+}
+
+INIT_STATE = {
+    "specialty": "dentist",
+    "time_window": "this week afternoons",
+    "radius_km": 5.0,
+    "user_location": "Berlin",
+    "transcript": [],
+}
+
+
+@contextmanager
+def _use_providers(providers, busy=()):
+    """Serve ``providers`` from the search and ``busy`` from the calendar inside the block."""
+    search, busy_ranges = graph.search_providers, graph.check_calendar_busy_ranges
+    graph.search_providers = lambda **kwargs: list(providers)
+    graph.check_calendar_busy_ranges = lambda start, end: list(busy)
+    try:
+        yield
+    finally:
+        graph.search_providers, graph.check_calendar_busy_ranges = search, busy_ranges
+
+
+def test_calls_nearest_three_providers():
+    """Slots come from the three nearest providers, nearest first."""
+    with _use_providers([TOO_FAR, FAR, NEAR, MID]):
+        state = graph.run_local_proposal(INIT_STATE)
+        assert [p["name"] for p in state["candidates"]] == ["Near Dental", "Mid Dental", "Far Dental"]
+        assert [s["start"][:10] for s in state["proposed_slots"]] == ["2026-02-10", "2026-02-11", "2026-02-12"]
+        assert state["chosen_slot"] == NEAR["openings"][0]
+        assert state["provider"]["name"] == "Near Dental"
+
+
+def test_falls_through_to_next_provider():
+    """A busy calendar at the nearest provider's slot books the next provider instead."""
+    with _use_providers([NEAR, MID, FAR], busy=[("2026-02-10T15:00:00", "2026-02-10T16:00:00")]):
+        state = graph.run_local_proposal(INIT_STATE)
+        assert state["provider"]["name"] == "Mid Dental"
+        assert state["chosen_slot"] == MID["openings"][0]
+
+
+def test_transcript_has_only_the_chosen_call():
+    """Only the booked provider's selection and call are logged."""
+    with _use_providers([NEAR, MID, FAR], busy=[("2026-02-10T15:00:00", "2026-02-10T16:00:00")]):
+        state = graph.run_local_proposal(INIT_STATE)
+        transcript = state["transcript"]
+        assert transcript[0] == "[SYS] Selected provider: Mid Dental"
+        assert transcript[1] == "[CALL] Calling Mid Dental..."
+        assert sum(line.startswith("[SYS] Selected provider") for line in transcript) == 1
+        assert transcript.count("[AGENT] Great, let me confirm one moment.") == 1
+        assert not any("Near Dental" in line or "Far Dental" in line for line in transcript)
+        assert transcript[-1] == "[SYS] Calendar ok for 2026-02-11T14:00:00"
+
+
+def test_graph_books_fallback_provider():
+    """The compiled graph books the fallback provider and logs a single call."""
+    with _use_providers([NEAR, MID, FAR], busy=[("2026-02-10T15:00:00", "2026-02-10T16:00:00")]):
+        final = asyncio.run(graph.build_graph_local().ainvoke(dict(INIT_STATE)))
+        result = final["result"]
+        assert result["status"] == "success"
+        assert result["provider"]["name"] == "Mid Dental"
+        assert result["transcript"].count("[AGENT] Great, let me confirm one moment.") == 1
+
+
+def test_apply_update_appends_transcript():
+    """Partial updates append transcript lines and overwrite every other key."""
+    state = {"transcript": ["[SYS] start"], "provider": NEAR, "calendar_ok": False}
+    graph._apply_update(state, {"transcript": ["[SYS] next"], "calendar_ok": True})
+    assert state["transcript"] == ["[SYS] start", "[SYS] next"]
+    assert state["calendar_ok"] is True
+    assert state["provider"] is NEAR
+
+    # Updates without transcript lines leave the log alone
+    graph._apply_update(state, {"provider": MID})
+    assert state["transcript"] == ["[SYS] start", "[SYS] next"]
+    assert state["provider"] is MID
+
+
+def test_graph_transcript_accumulates():
+    """The graph's reducer and run_local_proposal build the same log, keeping earlier lines."""
+    with _use_providers([NEAR, MID, FAR]):
+        init = dict(INIT_STATE, transcript=["[USER] Book a dentist"])
+        proposal = graph.run_local_proposal(init)
+        final = asyncio.run(graph.build_graph_local().ainvoke(init))
+        assert init["transcript"] == ["[USER] Book a dentist"], "the input state must not be mutated"
+        assert proposal["transcript"][0] == "[USER] Book a dentist"
+        assert final["transcript"][: len(proposal["transcript"])] == proposal["transcript"]
+        assert len(final["transcript"]) == len(set(final["transcript"])), "no line is logged twice"
+
+
+def _booking_state():
+    """A proposal ready to book at the nearest provider."""
+    return {
+        "provider": dict(NEAR, address="Near St 1"),
+        "chosen_slot": NEAR["openings"][0],
+        "booking_id": "booking-x",
+        "transcript": [],
+    }
+
+
+def test_reservation_error_cancels_event():
+    """An exception from the reservation still removes the event, then propagates."""
+    reserve_slot, cancel = graph.reserve_slot, graph.cancel_calendar_event
+    canceled = []
+
+    def failing_reserve(provider, slot, booking_id=None):
+        raise RuntimeError("provider unreachable")
+
+    graph.reserve_slot = failing_reserve
+    graph.cancel_calendar_event = lambda event_id, booking_id=None: canceled.append((event_id, booking_id))
+    try:
+        asyncio.run(graph.node_reserve_and_book(_booking_state()))
+    except RuntimeError as e:
+        assert str(e) == "provider unreachable"
+    else:
+        raise AssertionError("the reservation error was swallowed")
+    finally:
+        graph.reserve_slot, graph.cancel_calendar_event = reserve_slot, cancel
+    assert canceled == [("demo_event::Dentist appointment - Near Dental::2026-02-10T15:00:00", "booking-x")]
+
+
+def test_event_error_forgets_reservation():
+    """An exception from event creation drops the cached reservation, then propagates."""
+    create, invalidate = graph.create_calendar_event, graph.invalidate_reservation
+    invalidated = []
+
+    def failing_create(**kwargs):
+        raise RuntimeError("calendar down")
+
+    graph.create_calendar_event = failing_create
+    graph.invalidate_reservation = invalidated.append
+    try:
+        asyncio.run(graph.node_reserve_and_book(_booking_state()))
+    except RuntimeError as e:
+        assert str(e) == "calendar down"
+    else:
+        raise AssertionError("the calendar error was swallowed")
+    finally:
+        graph.create_calendar_event, graph.invalidate_reservation = create, invalidate
+    assert invalidated == ["booking-x"]
+
+
+class _JsonThenProse:
+    """A model stub streaming a JSON object and then prose, noting when its stream is closed."""
+
+    def __init__(self):
+        self.closed = False
+        self.sent = 0
+
+    async def astream(self, prompt):
+        try:
+            for text in ('{"specialty": ', '"dentist"}', " Let me know", " if that helps!"):
+                self.sent += 1
+                yield AIMessageChunk(content=text)
+        finally:
+            self.closed = True
+
+
+def test_extraction_stream_closes_after_json():
+    """Streaming stops at the closing brace and the model stream is closed right away."""
+    model = _JsonThenProse()
+
+    async def run():
+        content = await graph._stream_until_json_closes(model, "extract")
+        # Checked inside the loop: no garbage collection or later loop turn has run yet
+        return content, model.closed
+
+    content, closed = asyncio.run(run())
+    assert content == '{"specialty": "dentist"}'
+    assert model.sent == 2
+    assert closed
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_calls_nearest_three_providers,
+        test_falls_through_to_next_provider,
+        test_transcript_has_only_the_chosen_call,
+        test_graph_books_fallback_provider,
+        test_apply_update_appends_transcript,
+        test_graph_transcript_accumulates,
+        test_reservation_error_cancels_event,
+        test_event_error_forgets_reservation,
+        test_extraction_stream_closes_after_json,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for the cached provider search."""
+
+import os
+import sys
+from pathlib import Path
+
+# Local JSON catalog, never the real Google APIs
+os.environ["USE_GOOGLE_APIS"] = "false"
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import callpilot.tools.providers as providers
+from callpilot.tools.providers import search_providers
+
+_load_providers = providers.load_providers
+
+
+def _count_loads():
+    """Wrap load_providers with a counter and start from an empty cache; returns the list of loads.
+
+    Callers restore ``providers.load_providers`` when done.
+    """
+    loads = []
+
+    def counting():
+        loads.append(True)
+        return _load_providers()
+
+    providers.load_providers = counting
+    providers._SEARCH_CACHE.clear()
+    return loads
+
+
+def test_repeated_search_is_cached():
+    """The same search reads the catalog once; other searches read it again."""
+    loads = _count_loads()
+    try:
+        first = search_providers("dentist", 5.0, "Berlin")
+        again = search_providers("dentist", 5, "Berlin")
+        assert first and again == first
+        assert len(loads) == 1, "an int radius must hit the same entry as the float one"
+
+        search_providers("dentist", 2.0, "Berlin")
+        search_providers("dentist", 5.0, "Munich")
+        assert len(loads) == 3
+    finally:
+        providers.load_providers = _load_providers
+
+
+def test_cached_results_are_copies():
+    """Callers may sort or trim their list without changing the cached entry."""
+    _count_loads()
+    try:
+        first = search_providers("dentist", 5.0, "Berlin")
+        count = len(first)
+        first.clear()
+        assert len(search_providers("dentist", 5.0, "Berlin")) == count
+    finally:
+        providers.load_providers = _load_providers
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_repeated_search_is_cached,
+        test_cached_results_are_copies,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
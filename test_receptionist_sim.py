@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Tests for the simulated receptionist call adapter."""
+
+import os
+import sys
+from pathlib import Path
+
+# Use the MVP calendar stub, never the real Google Calendar
+os.environ["USE_GOOGLE_APIS"] = "false"
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import callpilot.adapters.receptionist_sim as receptionist_sim
+from callpilot.adapters.receptionist_sim import (
+    CallResult,
+    invalidate_reservation,
+    reserve_slot,
+    simulate_receptionist_call,
+    simulate_receptionist_calls,
+)
+from callpilot.tools.calendar import cancel_calendar_event
+
+PROVIDER = {
+    "name": "Mitte Dental",
+    "openings": [
+        {"start": "2026-02-09T09:00:00", "end": "2026-02-09T09:30:00"},
+        {"start": "2026-02-09T15:30:00", "end": "2026-02-09T16:00:00"},
+        {"start": "2026-02-10T18:00:00", "end": "2026-02-10T18:30:00"},
+        {"start": "2026-02-11T16:00:00", "end": "2026-02-11T16:30:00"},
+    ],
+}
+
+
+def test_call_result_contract():
+    """Calls return a CallResult with attribute access and a plain-dict form."""
+    res = simulate_receptionist_call(PROVIDER, "this week")
+    assert isinstance(res, CallResult)
+    assert res.ok is True
+    assert res.slots == tuple(PROVIDER["openings"][:3])
+    assert res.transcript[0] == "[CALL] Calling Mitte Dental..."
+    assert res.transcript[-1] == "[AGENT] Great, let me confirm one moment."
+
+    as_dict = res._asdict()
+    assert as_dict == {
+        "ok": True,
+        "slots": PROVIDER["openings"][:3],
+        "transcript": list(res.transcript),
+    }
+    assert isinstance(as_dict["slots"], list) and isinstance(as_dict["transcript"], list)
+
+
+def test_call_without_openings():
+    """Providers without openings get a failed result with an empty slot list."""
+    res = simulate_receptionist_call({"name": "Empty Clinic", "openings": []}, "this week")
+    assert res.ok is False
+    assert res.slots == ()
+    assert res._asdict()["slots"] == []
+    assert res.transcript == ("[RECEP] Sorry, no availability.",)
+
+    bare = simulate_receptionist_call(PROVIDER, "this week", with_transcript=False)
+    assert bare.ok is True and bare.transcript == ()
+
+
+def test_batch_keeps_input_order():
+    """Batch calls return one result per provider, in input order."""
+    empty = {"name": "Empty Clinic", "openings": []}
+    results = simulate_receptionist_calls([empty, PROVIDER], "this week")
+    assert [r.ok for r in results] == [False, True]
+
+
+def _starts(res):
+    return [s["start"][11:16] for s in res.slots]
+
+
+def test_daypart_constraints():
+    """Morning/afternoon/evening constraints keep only openings at that time of day."""
+    assert _starts(simulate_receptionist_call(PROVIDER, "next week mornings")) == ["09:00"]
+    assert _starts(simulate_receptionist_call(PROVIDER, "this week afternoons")) == ["15:30", "16:00"]
+    assert _starts(simulate_receptionist_call(PROVIDER, "Tuesday EVENING")) == ["18:00"]
+    # Dayparts combine
+    assert _starts(simulate_receptionist_call(PROVIDER, "morning or evening")) == ["09:00", "18:00"]
+
+
+def test_no_daypart_constraint():
+    """Constraints without a time of day offer the first three openings."""
+    res = simulate_receptionist_call(PROVIDER, "this week")
+    assert _starts(res) == ["09:00", "15:30", "18:00"]
+    assert "[RECEP] We can do: " + ", ".join(s["start"] for s in res.slots) in res.transcript
+
+
+def test_daypart_without_matches_falls_back():
+    """When no opening fits the time of day, the first openings are offered and the transcript says so."""
+    afternoons_only = {
+        "name": "Mitte Dental",
+        "openings": [{"start": "2026-02-09T15:30:00", "end": "2026-02-09T16:00:00"}],
+    }
+    for constraint in ("mornings", "evening"):
+        res = simulate_receptionist_call(afternoons_only, constraint)
+        assert res.ok is True
+        assert _starts(res) == ["15:30"]
+        assert "[RECEP] Nothing at that time of day, but we can do: 2026-02-09T15:30:00" in res.transcript
+
+    # Openings given as a one-shot iterator still fall back correctly
+    res = simulate_receptionist_call(
+        {"name": "Mitte Dental", "openings": iter(afternoons_only["openings"])}, "mornings"
+    )
+    assert _starts(res) == ["15:30"]
+
+
+_reserve_impl = receptionist_sim._reserve_impl
+
+
+def _count_provider_calls():
+    """Replace the provider call with a counter; returns the list of calls made.
+
+    Callers restore ``receptionist_sim._reserve_impl`` when done.
+    """
+    calls = []
+
+    def fake_reserve(provider_name, start):
+        calls.append((provider_name, start))
+        return True
+
+    receptionist_sim._reserve_impl = fake_reserve
+    return calls
+
+
+def test_reservation_retry_is_idempotent():
+    """A retry of the same booking doesn't call the provider again."""
+    calls = _count_provider_calls()
+    try:
+        slot = PROVIDER["openings"][0]
+        assert reserve_slot(PROVIDER, slot, "booking-a")
+        assert reserve_slot(PROVIDER, slot, "booking-a")
+        assert len(calls) == 1
+    finally:
+        receptionist_sim._reserve_impl = _reserve_impl
+
+
+def test_reservation_other_bookings_call_provider():
+    """Other bookings of the same slot, or calls without a booking id, always reach the provider."""
+    calls = _count_provider_calls()
+    try:
+        slot = PROVIDER["openings"][1]
+        reserve_slot(PROVIDER, slot, "booking-b")
+        reserve_slot(PROVIDER, slot, "booking-c")
+        reserve_slot(PROVIDER, slot)
+        reserve_slot(PROVIDER, slot)
+        # Same id, different slot: not a retry
+        reserve_slot(PROVIDER, PROVIDER["openings"][2], "booking-b")
+        assert len(calls) == 5
+    finally:
+        receptionist_sim._reserve_impl = _reserve_impl
+
+
+def test_reservation_invalidation():
+    """Invalidated or canceled bookings call the provider again on the next confirmation."""
+    calls = _count_provider_calls()
+    try:
+        slot = PROVIDER["openings"][3]
+        reserve_slot(PROVIDER, slot, "booking-d")
+        invalidate_reservation("booking-d")
+        reserve_slot(PROVIDER, slot, "booking-d")
+        cancel_calendar_event("demo_event::Dentist appointment::" + slot["start"], "booking-d")
+        reserve_slot(PROVIDER, slot, "booking-d")
+        assert len(calls) == 3
+    finally:
+        receptionist_sim._reserve_impl = _reserve_impl
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_call_result_contract,
+        test_call_without_openings,
+        test_batch_keeps_input_order,
+        test_daypart_constraints,
+        test_no_daypart_constraint,
+        test_daypart_without_matches_falls_back,
+        test_reservation_retry_is_idempotent,
+        test_reservation_other_bookings_call_provider,
+        test_reservation_invalidation,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())